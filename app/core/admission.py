@@ -0,0 +1,121 @@
+import heapq
+import asyncio
+import itertools
+from contextlib import asynccontextmanager
+from typing import List, Optional, Tuple
+from fastapi import HTTPException, status
+from app.core.deadline import Deadline
+
+class AdmissionRejected(HTTPException):
+    def __init__(self, detail: str, retry_after: int):
+        super().__init__(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail=detail,
+            headers={"Retry-After": str(retry_after)}
+        )
+
+class AdmissionController:
+    """Global cap on concurrent model inferences with a bounded, prioritized wait queue"""
+
+    QUERY = 0 # Lower value is served first
+    UPLOAD = 1
+    BATCH = 2 # Offline evaluation yields to interactive traffic
+
+    def __init__(self, max_in_flight: int, max_queue: int, queue_timeout: float, retry_after: int):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+
+        self.in_flight = 0
+        self._waiters: List[Tuple[int, int, asyncio.Future]] = []
+        self._sequence = itertools.count()
+
+        self.admitted = 0
+        self.shed_queue_full = 0
+        self.shed_timeout = 0
+        self.preempted = 0
+
+    def _reject(self, detail: str) -> AdmissionRejected:
+        return AdmissionRejected(detail, self.retry_after)
+
+    def _discard(self, waiter: asyncio.Future):
+        self._waiters = [entry for entry in self._waiters if entry[2] is not waiter]
+        heapq.heapify(self._waiters)
+
+    def _enqueue(self, priority: int) -> asyncio.Future:
+        if len(self._waiters) >= self.max_queue:
+            # Only waiters still pending count; a done future can neither run nor be displaced
+            self._waiters = [entry for entry in self._waiters if not entry[2].done()]
+            heapq.heapify(self._waiters)
+
+        if len(self._waiters) >= self.max_queue:
+            # A full queue still lets a higher-priority request displace the lowest-priority, newest waiter
+            victim = max(self._waiters, key=lambda waiter: (waiter[0], waiter[1]))
+            if victim[0] <= priority:
+                self.shed_queue_full += 1
+                raise self._reject("Server is overloaded, please retry later")
+
+            self._waiters.remove(victim)
+            heapq.heapify(self._waiters)
+            victim[2].set_exception(self._reject("Request was displaced by higher-priority work"))
+            self.preempted += 1
+
+        waiter = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (priority, next(self._sequence), waiter))
+        return waiter
+
+    async def acquire(self, priority: int, timeout: Optional[float] = None):
+        if self.in_flight < self.max_in_flight and not self._waiters:
+            self.in_flight += 1
+            self.admitted += 1
+            return
+
+        waiter = self._enqueue(priority)
+        try:
+            # The slot is handed over by release(), so in_flight is already counted when this returns
+            await asyncio.wait_for(waiter, timeout if timeout is not None else self.queue_timeout)
+        except asyncio.TimeoutError:
+            self._discard(waiter)
+            self.shed_timeout += 1
+            raise self._reject("Timed out waiting for inference capacity")
+        except asyncio.CancelledError:
+            # The client went away; if release() handed us the slot in the meantime, pass it on
+            if waiter.done() and not waiter.cancelled() and waiter.exception() is None:
+                self.release()
+            else:
+                self._discard(waiter)
+            raise
+        self.admitted += 1
+
+    def release(self):
+        while self._waiters:
+            _, _, waiter = heapq.heappop(self._waiters)
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+    @asynccontextmanager
+    async def admit(self, priority: int, timeout: Optional[float] = None, deadline: Optional[Deadline] = None):
+        await self.acquire(priority, timeout)
+        try:
+            yield
+        finally:
+            if deadline is None:
+                self.release()
+            else:
+                # Inference threads abandoned at the deadline still hold a core; keep the slot until they finish
+                deadline.when_settled(self.release)
+
+    def metrics(self) -> dict:
+        return {
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "queue_depth": len(self._waiters),
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "shed_queue_full": self.shed_queue_full,
+            "shed_timeout": self.shed_timeout,
+            "preempted": self.preempted
+        }
@@ -9,20 +9,84 @@ class Settings(BaseSettings):
 
     #ChrobaDB Settings
     chroma_persist_direcotry: str = "./data/chroma_db"
+    vector_backend: str = "chroma" # "chroma" or "numpy" (exact memory-mapped search, for corpora up to a few hundred thousand chunks)
+    numpy_store_directory: str = "./data/numpy_store"
+    vector_shard_count: int = 1 # >1 splits every collection into shards placed by document ID
+    vector_shard_hosts: str = "" # Comma-separated host:port of `chroma run` processes, one per shard; empty keeps shards in-process
+    vector_shard_workers: int = 0 # Scatter-gather threads shared by every tenant's sharded store; 0 means two per shard
+    tenant_isolation: bool = False # Give every JWT subject its own collection instead of the shared "documents" one
+
+    #Compact Vector Index Settings
+    compact_index_enabled: bool = False
+    compact_index_directory: str = "./data/compact_index"
+    compact_index_mode: str = "float16" # "float16" or "pq"
+    compact_index_pq_subvectors: int = 48
+    compact_index_pq_training_size: int = 10000
+    compact_index_rescore_factor: int = 4
+
+    #Retrieval Settings
+    retrieval_max_distance: float = 1.5 # Squared L2 on normalized embeddings (2 - 2cos); chunks further away are dropped
+    retrieval_confidence_weight: float = 0.3 # Share of the final confidence taken from retrieval similarity, the rest from QA
+
+    #Ingestion Settings
+    ingest_batch_size: int = 64 # Chunks embedded and written per step
+    ingest_memory_ceiling_mb: int = 0 # Ingest batches shrink while RSS is above this; 0 disables the ceiling
+    ingest_split_window_chars: int = 65536 # Text handed to the splitter at once
+
+    #Batch Query Settings
+    query_batch_max_questions: int = 1000
+    qa_batch_size: int = 16 # (question, context) pairs per padded QA forward pass
+
+    #Near-Duplicate Detection Settings
+    near_duplicate_detection: bool = False # Metadata filters only see the first copy of a deduplicated chunk
+    near_duplicate_threshold: float = 0.85 # Estimated Jaccard similarity of 5-word shingles
+    near_duplicate_index_path: str = "./data/near_duplicates.jsonl"
 
     #LLM and Embedding Model Settings
     model_name: str = "sentence-transformers/all-MiniLM-L6-v2"
     llm_model_name: str = "microsoft/DialoGPT-medium"
 
+    #Embedding Migration Settings
+    embedding_migration_rate_limit: float = 50.0 # Chunks re-embedded per second
+    embedding_migration_batch_size: int = 64
+
     #AWS Settings
     aws_endpoint_url: str = "http://localhost:4566"
     aws_access_key_id: str = "test"
     aws_secret_access_key: str = "test"
     aws_region_name: str = "us-east-1"
 
+    #Lambda Preprocessing Settings
+    lambda_batch_chunks: int = 32
+    lambda_batch_max_bytes: int = 200000 # Async invoke payloads are capped at 256 KB
+    lambda_max_concurrency: int = 8
+    lambda_result_poll_interval_seconds: float = 0.5
+    lambda_result_timeout_seconds: float = 60.0
+
+    #Snapshot Settings
+    snapshot_location: str = "./data/snapshots" # Local directory or s3://bucket/prefix
+    snapshot_restore_on_startup: bool = False # On a node with no local index, restore the latest snapshot, then catch up from S3
+    snapshot_catch_up_margin_seconds: float = 300.0 # S3 LastModified has whole-second precision and node clocks drift
+
+    #Health Check Settings
+    health_probe_interval_seconds: float = 15.0
+    health_probe_timeout_seconds: float = 2.0
+
     #Security Settings
     rate_limit_per_minute: int = 10
     max_document_size_mb: int = 25
+    admin_users: str = "demo" # Comma-separated JWT subjects allowed on /admin endpoints
+
+    #Admission Control Settings
+    max_inflight_inferences: int = 4 # Uploads and queries running model inference at once, across all clients
+    admission_queue_size: int = 32
+    admission_queue_timeout_seconds: float = 10.0
+    admission_retry_after_seconds: int = 5
+
+    #Query Deadline Settings
+    query_deadline_ms: int = 5000 # Default latency budget for /query
+    query_min_qa_budget_ms: int = 250 # Below this much remaining budget the QA model is skipped for the extractive answer
+    degraded_queue_depth: int = 16 # With this many queries waiting for admission, answers skip the QA model
 
     class Config:
         env_file = ".env"
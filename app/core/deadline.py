@@ -0,0 +1,48 @@
+import time
+import asyncio
+from typing import Callable, Optional, Set
+
+class Deadline:
+    """Monotonic time budget shared by every stage of one request"""
+
+    def __init__(self, budget_ms: float):
+        self.budget_ms = budget_ms
+        self.expires_at = time.monotonic() + budget_ms / 1000
+        self._abandoned: Set[asyncio.Future] = set()
+        self._settling = None
+
+    def remaining(self) -> float:
+        """Seconds left, never negative"""
+        return max(0.0, self.expires_at - time.monotonic())
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() == 0.0
+
+    def abandon(self, worker: asyncio.Future):
+        """Record a worker whose result was given up on but whose thread is still running"""
+        self._abandoned.add(worker)
+        # Retrieve the outcome so a late failure isn't reported as an unhandled exception
+        worker.add_done_callback(lambda done: done.cancelled() or done.exception())
+
+    def when_settled(self, callback: Callable[[], None]):
+        """Call `callback` once every abandoned worker has finished, right away if none is left"""
+        pending = [worker for worker in self._abandoned if not worker.done()]
+        if not pending:
+            callback()
+            return
+        self._settling = asyncio.ensure_future(asyncio.wait(pending))
+        self._settling.add_done_callback(lambda _: callback())
+
+async def run_within(deadline: Optional[Deadline], func, *args, **kwargs):
+    """Run a blocking call in a worker thread, raising asyncio.TimeoutError once the deadline passes"""
+    if deadline is None:
+        return await asyncio.to_thread(func, *args, **kwargs)
+
+    worker = asyncio.ensure_future(asyncio.to_thread(func, *args, **kwargs))
+    try:
+        return await asyncio.wait_for(asyncio.shield(worker), deadline.remaining())
+    except asyncio.TimeoutError:
+        # The thread cannot be interrupted; the deadline keeps track of it until it finishes
+        deadline.abandon(worker)
+        raise
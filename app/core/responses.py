@@ -0,0 +1,20 @@
+from typing import Any
+import msgpack
+from fastapi import Request
+from fastapi.responses import ORJSONResponse, Response
+from pydantic import BaseModel
+
+MSGPACK_MEDIA_TYPE = "application/x-msgpack"
+
+class MsgPackResponse(Response):
+    media_type = MSGPACK_MEDIA_TYPE
+
+    def render(self, content: Any) -> bytes:
+        return msgpack.packb(content, use_bin_type=True)
+
+def negotiate_response(request: Request, model: BaseModel) -> Response:
+    """msgpack for internal callers that ask for it, orjson otherwise"""
+    content = model.model_dump(mode="json")
+    if MSGPACK_MEDIA_TYPE in request.headers.get("accept", ""):
+        return MsgPackResponse(content=content)
+    return ORJSONResponse(content=content)
@@ -0,0 +1,61 @@
+"""`document-processor` Lambda: preprocesses one batch of chunks and writes the result to S3.
+
+Deployed as a standalone module; AWSService zips this file for create_function, so it may
+only import the standard library and boto3 (both present in the Lambda runtime).
+"""
+import os
+import re
+import json
+import time
+
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+def result_key(result_prefix: str, job_id: str, batch_index: int) -> str:
+    return f"{result_prefix}/{job_id}/{batch_index:05d}.json"
+
+def preprocess_chunk(text: str) -> dict:
+    normalized = WHITESPACE_PATTERN.sub(" ", text).strip()
+    return {
+        "content": normalized,
+        "length": len(normalized),
+        "word_count": len(normalized.split())
+    }
+
+def process_batch(event: dict, s3_client) -> dict:
+    """Preprocess the batch in `event` and store the result object the dispatcher polls for"""
+    chunk_start = event.get("chunk_start", 0)
+    result = {
+        "job_id": event["job_id"],
+        "document_id": event.get("document_id"),
+        "batch_index": event["batch_index"],
+        "chunk_start": chunk_start,
+        "chunks": [
+            {"chunk_id": chunk_start + i, **preprocess_chunk(text)}
+            for i, text in enumerate(event.get("chunks", []))
+        ],
+        "processed_at": time.time()
+    }
+
+    s3_client.put_object(
+        Bucket=event["bucket"],
+        Key=result_key(event["result_prefix"], event["job_id"], event["batch_index"]),
+        Body=json.dumps(result).encode("utf-8"),
+        ContentType="application/json"
+    )
+    return result
+
+def _s3_client():
+    import boto3
+
+    endpoint_url = os.environ.get("AWS_ENDPOINT_URL")
+    if not endpoint_url and os.environ.get("LOCALSTACK_HOSTNAME"):
+        endpoint_url = f"http://{os.environ['LOCALSTACK_HOSTNAME']}:{os.environ.get('EDGE_PORT', '4566')}"
+    return boto3.client("s3", endpoint_url=endpoint_url)
+
+def lambda_handler(event, context):
+    try:
+        result = process_batch(event, _s3_client())
+        return {"statusCode": 200, "body": json.dumps({"batch_index": result["batch_index"], "chunks": len(result["chunks"])})}
+    except Exception as e:
+        print(f"Error processing batch: {e}")
+        return {"statusCode": 500, "body": json.dumps({"error": str(e)})}
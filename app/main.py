@@ -1,23 +1,37 @@
-from fastapi import FastAPI, Depends, HTTPException, status, UploadFile, File
+from fastapi import FastAPI, Depends, HTTPException, Request, status, UploadFile, File
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
+from brotli_asgi import BrotliMiddleware
 from fastapi.security import HTTPBearer
 from slowapi import Limiter, _rate_limit_exceeded_handler
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
-from typing import List
+from typing import List, Optional
+from datetime import datetime
 import uvicorn
+import orjson
+import asyncio
 from app.core.config import settings
 from app.core.security import SecurityService
+from app.core.responses import negotiate_response
+from app.core.admission import AdmissionController
+from app.core.deadline import Deadline
 from app.services.rag_service import RAGService
 from app.services.document_service import DocumentService
 from app.services.aws_service import AWSService
-from app.models.query import QueryRequest, QueryResponse
+from app.services.chunk_container import ChunkContainerWriter
+from app.services.health_prober import HealthProber
+from app.services.index_snapshot import IndexSnapshots
+from app.models.query import BatchQueryRequest, QueryRequest, QueryResponse
 from app.models.document import DocumentResponse
+from app.models.admin import EmbeddingMigrationRequest
 
 app = FastAPI(
     title=settings.app_name,
     description="Enterprise RAG System for Abdul Hadi's Portfolio",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
 limiter = Limiter(key_func=get_remote_address)
@@ -32,15 +46,73 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Brotli when the client accepts it, gzip otherwise
+app.add_middleware(BrotliMiddleware, minimum_size=1024, gzip_fallback=True)
+
 security = HTTPBearer()
 
+aws_service = AWSService()
+
+# A new node installs the latest snapshot before RAGService opens the index directories
+index_snapshots = IndexSnapshots(settings.snapshot_location, s3_client=aws_service.s3_client)
+restored_snapshot = None
+if settings.snapshot_restore_on_startup:
+    try:
+        restored_snapshot = index_snapshots.restore_latest()
+    except Exception as e:
+        print(f"Error restoring index snapshot: {e}")
+
 rag_service = RAGService()
 document_service = DocumentService()
-aws_service = AWSService()
+
+# Global limit on concurrent inferences; slowapi above only limits each client IP
+admission = AdmissionController(
+    max_in_flight=settings.max_inflight_inferences,
+    max_queue=settings.admission_queue_size,
+    queue_timeout=settings.admission_queue_timeout_seconds,
+    retry_after=settings.admission_retry_after_seconds
+)
+
+# Probes run in the background; /health only reads the latest snapshot
+health_prober = HealthProber(
+    {
+        "s3": aws_service.probe_s3,
+        "lambda": aws_service.probe_lambda,
+        "vector_store": rag_service.probe_vector_store,
+        "models": rag_service.probe_models
+    },
+    interval_seconds=settings.health_probe_interval_seconds,
+    timeout_seconds=settings.health_probe_timeout_seconds
+)
+
+async def catch_up_documents(since: float) -> int:
+    """Index documents that reached S3 after the restored snapshot was taken"""
+    caught_up = 0
+    # Re-indexing a document is idempotent, so err towards replaying a few that the snapshot already has
+    for document_id in await aws_service.list_documents_modified_since(since - settings.snapshot_catch_up_margin_seconds):
+        document = await aws_service.retrieve_document(document_id)
+        if document is None:
+            continue
+
+        metadata = document.get("metadata") or {}
+        index_metadata = metadata.get("index_metadata") or {"filename": document_id, "document_id": document_id}
+        if await rag_service.add_documents([document["content"]], [index_metadata], tenant=metadata.get("tenant")):
+            caught_up += 1
+    return caught_up
 
 @app.on_event("startup")
 async def startup_event():
     await aws_service.setup_infrastructure()
+    if restored_snapshot is not None:
+        caught_up = await catch_up_documents(restored_snapshot["created_at"])
+        print(f"Caught up {caught_up} documents ingested after the snapshot")
+    await rag_service.resume_embedding_migration()
+    rag_service.start_compact_backfill()
+    health_prober.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await health_prober.stop()
 
 @app.get("/")
 async def root():
@@ -50,20 +122,43 @@ async def root():
         "status": "healthy"
     }
 
+@app.get("/metrics")
+async def metrics():
+    return {"admission": admission.metrics()}
+
 @app.get("/health")
 async def health_check():
-    aws_health = await aws_service.get_service_health()
-    doc_status = await rag_service.get_document_status()
+    snapshot = health_prober.get_snapshot()
+    probes = snapshot["probes"]
+
+    def healthy(name: str) -> bool:
+        return probes.get(name, {}).get("healthy", False)
 
     return {
-        "status": "healthy",
+        "status": snapshot["status"],
+        "checked_at": snapshot["checked_at"],
+        "staleness_us": snapshot["staleness_us"],
         "services": {
-            "rag": "healthy",
-            "aws": aws_health,
-            "documents": doc_status
-        }
+            "rag": "healthy" if healthy("vector_store") and healthy("models") else "unhealthy",
+            "aws": {"s3": healthy("s3"), "lambda": healthy("lambda")},
+            "documents": probes.get("vector_store", {}).get("detail", {})
+        },
+        "probes": probes
     }
 
+def get_tenant(token_payload: dict) -> Optional[str]:
+    if not settings.tenant_isolation:
+        return None
+    return token_payload.get("sub")
+
+def require_admin(token_payload: dict):
+    admins = {user.strip() for user in settings.admin_users.split(",") if user.strip()}
+    if token_payload.get("sub") not in admins:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin privileges required"
+        )
+
 @app.post("/auth/token")
 async def create_token(username: str, password: str):
     if username == "demo" and password == "demo123": #dummy credentials
@@ -78,12 +173,12 @@ async def create_token(username: str, password: str):
 @app.post("/documents/upload", response_model=DocumentResponse)
 @limiter.limit("5/minute")
 async def upload_document(
-    request: any,
+    request: Request,
     file: UploadFile = File(...),
     token: str = Depends(security)
 ):
     try:
-        SecurityService.verify_token(token.credentials)
+        token_payload = SecurityService.verify_token(token.credentials)
         document_data = await document_service.process_upload_file(file)
 
         if not document_service.validate_document_content(document_data["text"]):
@@ -92,22 +187,42 @@ async def upload_document(
                 detail="Document content is not valid"
             )
         
-        success = await rag_service.add_document(
-            [document_data["text"]],
-            [{"filename": document_data["filename"], "type": document_data["type"]}]
-        )
+        tenant = get_tenant(token_payload)
+        index_metadata = {
+            "filename": document_data["filename"],
+            "type": document_data["type"],
+            "document_id": document_data["filename"],
+            "uploaded_by": token_payload.get("sub", ""),
+            "uploaded_at": datetime.now().timestamp()
+        }
 
-        if not success:
-            raise HTTPException(
-                status_code=500,
-                detail="Failed to add document to RAG system"
-            )
-        
-        await aws_service.store_document(
-            document_data["filename"],
-            document_data["text"],
-            {"original_filename": document_data["original_filename"]}
-        )
+        # Vectors and the S3 copy are written inside one gate, so a snapshot never sees one without the other
+        async with rag_service.write_gate.writing():
+            # The container is filled from the chunks as they are indexed, so the document is split only once
+            with ChunkContainerWriter(
+                {
+                    "original_filename": document_data["original_filename"],
+                    # Lets a node restored from a snapshot re-index this document exactly
+                    "index_metadata": index_metadata,
+                    "tenant": tenant
+                },
+                content=document_data["text"]
+            ) as container:
+                async with admission.admit(AdmissionController.UPLOAD):
+                    success = await rag_service.add_documents(
+                        [document_data["text"]],
+                        [index_metadata],
+                        tenant=tenant,
+                        on_chunk=lambda _, chunk: container.add(chunk)
+                    )
+
+                if not success:
+                    raise HTTPException(
+                        status_code=500,
+                        detail="Failed to add document to RAG system"
+                    )
+
+                await aws_service.store_document(document_data["filename"], document_data["text"], container=container)
 
         return DocumentResponse(
             id=document_data["filename"],
@@ -116,6 +231,8 @@ async def upload_document(
             type=document_data["type"],
             status="processed"
         )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
@@ -125,34 +242,91 @@ async def upload_document(
 @app.post("/query", response_model=QueryResponse)
 @limiter.limit("10/minute")
 async def query_documents(
-    request: any,
+    request: Request,
     query_request: QueryRequest,
     token: str = Depends(security)
 ):
     try:
-        SecurityService.verify_token(token.credentials)
+        token_payload = SecurityService.verify_token(token.credentials)
 
-        result = await rag_service.query_documents(
-            query_request.question,
-            k=query_request.max_results
-        )
+        # Time spent queued for admission comes out of the same budget
+        deadline = Deadline(query_request.deadline_ms or settings.query_deadline_ms)
+        queue_timeout = min(settings.admission_queue_timeout_seconds, deadline.remaining())
+
+        async with admission.admit(AdmissionController.QUERY, timeout=queue_timeout, deadline=deadline):
+            # Under a backlog, answer extractively so the slot frees up sooner for the queries behind
+            overloaded = admission.metrics()["queue_depth"] >= settings.degraded_queue_depth
+            result = await rag_service.query_documents(
+                query_request.question,
+                k=query_request.max_results,
+                filters=query_request.filters.model_dump() if query_request.filters else None,
+                tenant=get_tenant(token_payload),
+                response_mode=query_request.response_mode,
+                degraded=overloaded,
+                deadline=deadline
+            )
 
-        return QueryResponse(
+        return negotiate_response(request, QueryResponse(
             question=query_request.question,
             answer=result["answer"],
             sources=result["sources"],
-            confidence=result["confidence"]
-        )
+            confidence=result["confidence"],
+            degraded=result.get("degraded", False)
+        ))
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=500,
             detail=str(e)
         )
     
+@app.post("/query/batch")
+@limiter.limit("5/minute")
+async def query_batch(
+    request: Request,
+    batch_request: BatchQueryRequest,
+    token: str = Depends(security)
+):
+    token_payload = SecurityService.verify_token(token.credentials)
+
+    if len(batch_request.queries) > settings.query_batch_max_questions:
+        raise HTTPException(
+            status_code=413,
+            detail=f"At most {settings.query_batch_max_questions} questions per batch"
+        )
+
+    # Held for the whole stream; released when it ends, fails or the client goes away
+    await admission.acquire(AdmissionController.BATCH)
+    released = False
+
+    def release_slot():
+        nonlocal released
+        if not released:
+            released = True
+            admission.release()
+
+    async def stream_results():
+        try:
+            async for result in rag_service.query_batch(
+                [query.model_dump() for query in batch_request.queries],
+                tenant=get_tenant(token_payload)
+            ):
+                yield orjson.dumps(result) + b"\n"
+        finally:
+            release_slot()
+
+    return StreamingResponse(
+        stream_results(),
+        media_type="application/x-ndjson",
+        # Covers a response that is never iterated
+        background=BackgroundTask(release_slot)
+    )
+
 @app.get("/documents")
 @limiter.limit("20/minute")
 async def list_documents(
-    request: any,
+    request: Request,
     token: str = Depends(security)
 ):
     
@@ -169,5 +343,100 @@ async def list_documents(
             detail=str(e)
         )
 
+@app.get("/documents/{document_id}/chunks/{chunk_id}")
+@limiter.limit("60/minute")
+async def get_document_chunk(
+    request: Request,
+    document_id: str,
+    chunk_id: int,
+    token: str = Depends(security)
+):
+    token_payload = SecurityService.verify_token(token.credentials)
+
+    chunk = await aws_service.retrieve_chunk(document_id, chunk_id)
+    # Another tenant's document answers exactly like a missing one
+    if chunk is None or chunk["metadata"].get("tenant") != get_tenant(token_payload):
+        raise HTTPException(
+            status_code=404,
+            detail="Chunk not found"
+        )
+
+    return {
+        "document_id": chunk["document_id"],
+        "chunk_id": chunk["chunk_id"],
+        "filename": chunk["metadata"].get("original_filename"),
+        "content": chunk["content"]
+    }
+
+@app.post("/admin/embedding-migration")
+async def start_embedding_migration(
+    migration_request: EmbeddingMigrationRequest,
+    token: str = Depends(security)
+):
+    require_admin(SecurityService.verify_token(token.credentials))
+
+    try:
+        return await rag_service.start_embedding_migration(
+            migration_request.model_name,
+            rate_limit_per_second=migration_request.rate_limit_per_second,
+            batch_size=migration_request.batch_size
+        )
+    except ValueError as e:
+        raise HTTPException(
+            status_code=409,
+            detail=str(e)
+        )
+
+@app.get("/admin/embedding-migration")
+async def embedding_migration_status(token: str = Depends(security)):
+    require_admin(SecurityService.verify_token(token.credentials))
+    return rag_service.embedding_migration_status()
+
+@app.post("/admin/snapshots")
+async def create_index_snapshot(token: str = Depends(security)):
+    require_admin(SecurityService.verify_token(token.credentials))
+
+    if rag_service.embedding_migration and rag_service.embedding_migration.running:
+        raise HTTPException(
+            status_code=409,
+            detail="Wait for the embedding migration to finish before taking a snapshot"
+        )
+
+    try:
+        return await index_snapshots.create(rag_service.write_gate)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=409,
+            detail=str(e)
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=str(e)
+        )
+
+@app.get("/admin/snapshots/latest")
+async def latest_index_snapshot(token: str = Depends(security)):
+    require_admin(SecurityService.verify_token(token.credentials))
+
+    pointer = await asyncio.to_thread(index_snapshots.latest)
+    if pointer is None:
+        raise HTTPException(
+            status_code=404,
+            detail="No snapshot found"
+        )
+    return pointer
+
+@app.get("/admin/near-duplicates")
+async def near_duplicate_report(token: str = Depends(security)):
+    require_admin(SecurityService.verify_token(token.credentials))
+
+    if rag_service.near_duplicates is None:
+        raise HTTPException(
+            status_code=404,
+            detail="Near-duplicate detection is disabled"
+        )
+    return rag_service.near_duplicates.report()
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
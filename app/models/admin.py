@@ -0,0 +1,7 @@
+from pydantic import BaseModel
+from typing import Optional
+
+class EmbeddingMigrationRequest(BaseModel):
+    model_name: str
+    rate_limit_per_second: Optional[float] = None
+    batch_size: Optional[int] = None
\ No newline at end of file
@@ -1,12 +1,27 @@
-from pydantic import BaseModel
-from typing import List, Dict, Optional, Any
+from pydantic import BaseModel, Field
+from typing import List, Dict, Literal, Optional, Any
+from datetime import datetime
+
+class QueryFilters(BaseModel):
+    document_id: Optional[str] = None
+    document_type: Optional[str] = None
+    uploaded_by: Optional[str] = None
+    uploaded_after: Optional[datetime] = None
+    uploaded_before: Optional[datetime] = None
 
 class QueryRequest(BaseModel):
-    query: str
+    question: str
     max_results: int = 3
+    filters: Optional[QueryFilters] = None
+    response_mode: Literal["full", "snippet"] = "full" # "snippet" returns ids, scores and highlighted snippets only
+    deadline_ms: Optional[int] = Field(default=None, gt=0) # Latency budget; the server default applies when omitted
+
+class BatchQueryRequest(BaseModel):
+    queries: List[QueryRequest] = Field(..., min_length=1)
 
 class QueryResponse(BaseModel):
     question: str
     answer: str
     sources: List[Dict[str, Any]]
-    confidence: float
\ No newline at end of file
+    confidence: float
+    degraded: bool = False # Answer came from the extractive fallback instead of the QA model
@@ -0,0 +1,144 @@
+import re
+import math
+import hashlib
+import threading
+from collections import Counter, OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+class ExtractiveAnswerEngine:
+    """BM25 sentence scorer used when the QA model is unavailable or there is no time to run it"""
+
+    STOPWORDS = frozenset("""
+        a about above after again all am an and any are as at be because been before being below between both
+        but by can could did do does doing down during each few for from further had has have having he her here
+        hers him his how i if in into is it its itself just me more most my no nor not now of off on once only or
+        other our ours out over own same she should so some such than that the their theirs them then there these
+        they this those through to too under until up very was we were what when where which while who whom why
+        will with would you your yours
+    """.split())
+    WORD_PATTERN = re.compile(r"[a-z0-9]+")
+    SENTENCE_PATTERN = re.compile(r"(?<=[.!?])\s+|\n+")
+    SUFFIXES = ("ational", "ization", "fulness", "ousness", "iveness", "ement", "ments", "ment", "ness",
+                "ings", "ing", "edly", "ies", "ied", "ed", "ly", "s")
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75, cache_bytes: int = 16 * 1024 * 1024):
+        self.k1 = k1
+        self.b = b
+        self.cache_bytes = cache_bytes
+
+        # Corpus statistics for IDF; their size grows with the vocabulary, not with the number of chunks
+        self.document_frequency: Counter = Counter() # Sentences containing each term
+        self.sentence_count = 0
+        self.total_length = 0
+
+        # chunk key -> (approximate bytes, [(sentence, term frequencies, token count)]), for chunks seen at query time
+        self.chunks: "OrderedDict[str, Tuple[int, List[Tuple[str, Dict[str, int], int]]]]" = OrderedDict()
+        self.cached_bytes = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def stem(cls, word: str) -> str:
+        if word.endswith("ss"):
+            return word
+        if word.endswith("es") and word[:-2].endswith(("x", "ch", "sh", "ss", "z")):
+            return word[:-2]
+        for suffix in cls.SUFFIXES:
+            if word.endswith(suffix) and len(word) - len(suffix) >= 3:
+                stemmed = word[:-len(suffix)]
+                return stemmed + "y" if suffix in ("ies", "ied") else stemmed
+        return word
+
+    @classmethod
+    def tokenize(cls, text: str) -> List[str]:
+        return [
+            cls.stem(word) for word in cls.WORD_PATTERN.findall(text.lower())
+            if word not in cls.STOPWORDS
+        ]
+
+    @classmethod
+    def split_sentences(cls, text: str) -> List[str]:
+        return [sentence.strip() for sentence in cls.SENTENCE_PATTERN.split(text) if sentence.strip()]
+
+    @staticmethod
+    def chunk_key(text: str) -> str:
+        return hashlib.blake2b(text.encode("utf-8"), digest_size=12).hexdigest()
+
+    def _parse(self, text: str) -> List[Tuple[str, Dict[str, int], int]]:
+        entries = []
+        for sentence in self.split_sentences(text):
+            tokens = self.tokenize(sentence)
+            if tokens:
+                entries.append((sentence, dict(Counter(tokens)), len(tokens)))
+        return entries
+
+    def index_chunk(self, text: str):
+        """Add one ingested chunk's sentences to the corpus statistics; nothing about the chunk is kept"""
+        sentences = [self.tokenize(sentence) for sentence in self.split_sentences(text)]
+        sentences = [tokens for tokens in sentences if tokens]
+        with self._lock:
+            for tokens in sentences:
+                self.document_frequency.update(set(tokens))
+                self.sentence_count += 1
+                self.total_length += len(tokens)
+
+    def index_chunks(self, texts: List[str]):
+        for text in texts:
+            self.index_chunk(text)
+
+    def _entries(self, text: str) -> List[Tuple[str, Dict[str, int], int]]:
+        """Parsed sentences of a retrieved chunk, from a cache bounded by `cache_bytes`"""
+        key = self.chunk_key(text)
+        with self._lock:
+            if key in self.chunks:
+                self.chunks.move_to_end(key)
+                return self.chunks[key][1]
+
+        entries = self._parse(text)
+        # Rough footprint: the sentence text plus ~100 bytes per dict entry and per tuple
+        size = len(text) + sum(100 * (len(frequencies) + 1) for _, frequencies, _ in entries)
+        with self._lock:
+            if key not in self.chunks and size <= self.cache_bytes:
+                self.chunks[key] = (size, entries)
+                self.cached_bytes += size
+                while self.cached_bytes > self.cache_bytes:
+                    evicted, _ = self.chunks.popitem(last=False)[1]
+                    self.cached_bytes -= evicted
+        return entries
+
+    def _idf(self, term: str) -> float:
+        df = self.document_frequency.get(term, 0)
+        return math.log(1 + (self.sentence_count - df + 0.5) / (df + 0.5))
+
+    def answer(self, question: str, contexts: List[str]) -> Tuple[Optional[str], float]:
+        """Best sentence across `contexts` and a 0-1 confidence relative to a perfect match"""
+        query_terms = set(self.tokenize(question))
+        if not query_terms:
+            return None, 0.0
+
+        entries = [entry for text in contexts for entry in self._entries(text)]
+        if not entries:
+            return None, 0.0
+
+        with self._lock:
+            idf = {term: self._idf(term) for term in query_terms}
+            average_length = (
+                self.total_length / self.sentence_count if self.sentence_count
+                else sum(length for _, _, length in entries) / len(entries)
+            )
+
+        best_sentence, best_score = None, 0.0
+        for sentence, frequencies, length in entries:
+            matched = query_terms.intersection(frequencies)
+            if not matched:
+                continue
+
+            length_norm = self.k1 * (1 - self.b + self.b * length / average_length)
+            score = sum(
+                idf[term] * frequencies[term] * (self.k1 + 1) / (frequencies[term] + length_norm)
+                for term in matched
+            )
+            if score > best_score:
+                best_sentence, best_score = sentence, score
+
+        max_score = sum(idf.values()) * (self.k1 + 1)
+        return best_sentence, (min(1.0, best_score / max_score) if max_score else 0.0)
@@ -1,13 +1,23 @@
+import io
+import time
+import uuid
 import boto3
+import asyncio
+import zipfile
+import tempfile
+import threading
 from botocore.config import Config
-from typing import Dict, List, Optional
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
 import json
 from app.core.config import settings
+from app.services.chunk_container import ChunkContainer, ChunkContainerWriter
+from app.lambdas import document_processor
 
 class AWSService:
     def __init__(self):
         self.config = Config(
-            region_name=settings.aws_default_region,
+            region_name=settings.aws_region_name,
             retries={'max_attempts': 2}
         )
 
@@ -36,6 +46,17 @@ class AWSService:
         )
 
         self.bucket_name = "enterprise-documents"
+        self.header_cache: "OrderedDict[str, Tuple[int, int, dict]]" = OrderedDict() # (approximate bytes, header length, header)
+        self.header_cache_bytes = 64 * 1024 * 1024
+        self.header_cache_used = 0
+        self.header_cache_lock = threading.Lock() # Chunk reads run in worker threads
+        self.header_prefetch_bytes = 16384 # Covers the prefix and header of most documents in one range GET
+        self.processor_function_name = "document-processor"
+        self.processing_result_prefix = "processing-results"
+
+    @staticmethod
+    def _document_key(document_id: str) -> str:
+        return f"documents/{document_id}.chunks"
 
     async def setup_infrastructure(self):
         try:
@@ -55,62 +76,72 @@ class AWSService:
             if "BucketAlreadyOwnedByYou" not in str(e):
                 raise e
             
+    @staticmethod
+    def _build_lambda_package() -> bytes:
+        """Zip the document_processor module as the deployment package"""
+        with open(document_processor.__file__, "rb") as f:
+            source = f.read()
+
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as package:
+            package.writestr("document_processor.py", source)
+        return buffer.getvalue()
+
     async def _setup_lambda_function(self):
         try:
-            lambda_code = """
-import json
-import base64
-
-def lambda_handler(event, context):
-    try:
-    document_id = event.get('document_id')
-    content = event.get('content')
-
-    preprocessed_content = content.upper() if content else ""
-
-    return{
-    'statusCode': 200,
-    'body': json.dumps({
-        'document_id': document_id,
-        'processed': True,
-        'content_length': len(preprocessed_content)
-    })
-    }
-    except Exception as e:
-        return {
-            'statusCode': 500,
-            'body': json.dumps({'error': str(e)})
-        }
-"""
-
             self.lambda_client.create_function(
-                FunctionName='document-processor',
+                FunctionName=self.processor_function_name,
                 Runtime='python3.9',
                 Role='arn:aws:iam::000000000000:role/lambda-role',
-                Handler='index.lambda_handler',
-                Code={'ZipFile': lambda_code.encode()},
-                Description='Document processing function'
+                Handler='document_processor.lambda_handler',
+                Code={'ZipFile': self._build_lambda_package()},
+                Description='Document processing function',
+                Timeout=60
             )
-            print("Created Lambda function 'document-processor' successfully.")
+            print(f"Created Lambda function '{self.processor_function_name}' successfully.")
 
         except Exception as e:
             if "ResourceConflictException" not in str(e):
                 raise e
             
-    async def store_document(self, document_id: str, content: str, metadata: dict = None) -> bool:
-        try:
-            document_data = {
-                'content': content,
-                'metadata': metadata or {}
-            }
-
-            self.s3_client.put_object(
-                Bucket=self.bucket_name,
-                Key=f"documents/{document_id}.json",
-                Body=json.dumps(document_data),
-                ContentType='application/json'
+    def _put_container(self, document_id: str, writer: ChunkContainerWriter):
+        # Spooled to disk and uploaded in parts, so neither the chunk list nor the container is held in memory
+        with tempfile.TemporaryFile() as container:
+            writer.finish(container)
+            container.seek(0)
+            self.s3_client.upload_fileobj(
+                container,
+                self.bucket_name,
+                self._document_key(document_id),
+                ExtraArgs={'ContentType': 'application/octet-stream'}
             )
 
+    def _write_container(self, document_id: str, content: str, metadata: Optional[dict], chunks: Optional[Iterable[str]]):
+        with ChunkContainerWriter(metadata, content) as writer:
+            for chunk in (chunks if chunks is not None else ChunkContainer.split_fixed(content)):
+                writer.add(chunk)
+            self._put_container(document_id, writer)
+
+    async def store_document(
+        self,
+        document_id: str,
+        content: str,
+        metadata: dict = None,
+        chunks: Iterable[str] = None,
+        container: Optional[ChunkContainerWriter] = None
+    ) -> bool:
+        """Store a document as a chunk container; `container` is one already filled while indexing"""
+        try:
+            # Splitting, compression and the upload are all blocking; keep them off the event loop
+            if container is not None:
+                await asyncio.to_thread(self._put_container, document_id, container)
+            else:
+                await asyncio.to_thread(self._write_container, document_id, content, metadata, chunks)
+            with self.header_cache_lock:
+                entry = self.header_cache.pop(document_id, None)
+                if entry:
+                    self.header_cache_used -= entry[0]
+
             return True
         except Exception as e:
             print(f"Error storing document: {str(e)}")
@@ -118,33 +149,174 @@ def lambda_handler(event, context):
         
     async def retrieve_document(self, document_id: str) -> Optional[Dict]:
         try:
-            response = self.s3_client.get_object(
-                Bucket=self.bucket_name,
-                Key=f"documents/{document_id}.json"
-            )
+            try:
+                response = self.s3_client.get_object(
+                    Bucket=self.bucket_name,
+                    Key=self._document_key(document_id)
+                )
+            except self.s3_client.exceptions.NoSuchKey:
+                # Documents stored before the chunk container format
+                response = self.s3_client.get_object(
+                    Bucket=self.bucket_name,
+                    Key=f"documents/{document_id}.json"
+                )
+                return json.loads(response['Body'].read())
 
-            document_data = json.loads(response['Body'].read())
-            return document_data
+            chunks, header, trailer = ChunkContainer.read_all(response['Body'].read())
+            return {
+                'content': ChunkContainer.reassemble(chunks, trailer),
+                'metadata': header['metadata']
+            }
         
         except Exception as e:
             print(f"Error retrieving document: {str(e)}")
             return None
+
+    def _read_range(self, key: str, start: int, end: int) -> bytes:
+        response = self.s3_client.get_object(
+            Bucket=self.bucket_name,
+            Key=key,
+            Range=f"bytes={start}-{end}"
+        )
+        return response['Body'].read()
+
+    def _read_header(self, document_id: str) -> Tuple[int, dict]:
+        with self.header_cache_lock:
+            if document_id in self.header_cache:
+                self.header_cache.move_to_end(document_id)
+                return self.header_cache[document_id][1:]
+
+        key = self._document_key(document_id)
+        data = self._read_range(key, 0, self.header_prefetch_bytes - 1)
+        header_length = ChunkContainer.parse_prefix(data)
+
+        header_end = ChunkContainer.PREFIX_SIZE + header_length
+        if len(data) < header_end:
+            data += self._read_range(key, len(data), header_end - 1)
+        header = ChunkContainer.parse_header(data[ChunkContainer.PREFIX_SIZE:header_end])
+
+        # Parsed, each [offset, length] pair costs far more than its JSON text
+        size = header_length + 120 * len(header["chunks"])
+        with self.header_cache_lock:
+            if document_id not in self.header_cache and size <= self.header_cache_bytes:
+                self.header_cache[document_id] = (size, header_length, header)
+                self.header_cache_used += size
+                while self.header_cache_used > self.header_cache_bytes:
+                    self.header_cache_used -= self.header_cache.popitem(last=False)[1][0]
+        return header_length, header
+
+    def _read_chunk(self, document_id: str, chunk_id: int) -> Dict:
+        header_length, header = self._read_header(document_id)
+        start, end = ChunkContainer.chunk_range(header, header_length, chunk_id)
+
+        return {
+            'document_id': document_id,
+            'chunk_id': chunk_id,
+            'content': ChunkContainer.decode_chunk(self._read_range(self._document_key(document_id), start, end)),
+            'metadata': header['metadata']
+        }
+
+    async def retrieve_chunk(self, document_id: str, chunk_id: int) -> Optional[Dict]:
+        """Fetch one stored chunk with a byte-range GET instead of downloading the whole document"""
+        try:
+            return await asyncio.to_thread(self._read_chunk, document_id, chunk_id)
+
+        except Exception as e:
+            print(f"Error retrieving chunk: {str(e)}")
+            return None
         
-    async def process_document_async(self, document_id: str, content: str) -> dict:
+    @staticmethod
+    def _batch_chunks(chunks: List[str], max_chunks: int, max_bytes: int) -> List[Tuple[int, List[str]]]:
+        """Group chunks into (first chunk id, chunks) batches that fit one async invoke payload"""
+        batches = []
+        current, current_bytes, start = [], 0, 0
+        for chunk_id, chunk in enumerate(chunks):
+            # Measured as it goes over the wire: json.dumps escapes non-ASCII, up to 12 bytes per character
+            size = len(json.dumps(chunk)) + 2
+            if current and (len(current) >= max_chunks or current_bytes + size > max_bytes):
+                batches.append((start, current))
+                current, current_bytes, start = [], 0, chunk_id
+            current.append(chunk)
+            current_bytes += size
+        if current:
+            batches.append((start, current))
+        return batches
+
+    async def process_document_async(self, document_id: str, content: str, chunks: List[str] = None) -> dict:
+        """Fan chunk batches out to document-processor as fire-and-forget invokes"""
         try:
-            response = self.lambda_client.invoke(
-                FunctionName='document-processor',
-                Payload=json.dumps({
+            chunks = chunks if chunks is not None else ChunkContainer.split_fixed(content)
+            batches = self._batch_chunks(chunks, settings.lambda_batch_chunks, settings.lambda_batch_max_bytes)
+            job_id = uuid.uuid4().hex
+            semaphore = asyncio.Semaphore(settings.lambda_max_concurrency)
+
+            async def invoke(batch_index: int, chunk_start: int, batch: List[str]):
+                payload = json.dumps({
+                    'job_id': job_id,
                     'document_id': document_id,
-                    'content': content
+                    'batch_index': batch_index,
+                    'chunk_start': chunk_start,
+                    'chunks': batch,
+                    'bucket': self.bucket_name,
+                    'result_prefix': self.processing_result_prefix
                 })
-            )
-            result = json.loads(response['Payload'].read())
-            return result
+                async with semaphore:
+                    # 'Event' returns as soon as Lambda queues the batch; results land in S3
+                    await asyncio.to_thread(
+                        self.lambda_client.invoke,
+                        FunctionName=self.processor_function_name,
+                        InvocationType='Event',
+                        Payload=payload
+                    )
+
+            await asyncio.gather(*(
+                invoke(batch_index, chunk_start, batch)
+                for batch_index, (chunk_start, batch) in enumerate(batches)
+            ))
+
+            return {
+                'job_id': job_id,
+                'document_id': document_id,
+                'batches': len(batches),
+                'chunks': len(chunks)
+            }
         
         except Exception as e:
             print(f"Error processing document asynchronously: {str(e)}")
             return {'error': str(e)}
+
+    async def collect_processing_results(self, job_id: str, expected_batches: int, timeout: float = None) -> dict:
+        """Poll S3 until every batch of a dispatched job has written its result, or the timeout passes"""
+        try:
+            timeout = settings.lambda_result_timeout_seconds if timeout is None else timeout
+            prefix = f"{self.processing_result_prefix}/{job_id}/"
+            deadline = time.monotonic() + timeout
+
+            while True:
+                response = await asyncio.to_thread(
+                    self.s3_client.list_objects_v2,
+                    Bucket=self.bucket_name,
+                    Prefix=prefix
+                )
+                keys = sorted(obj['Key'] for obj in response.get('Contents', []))
+                if len(keys) >= expected_batches or time.monotonic() >= deadline:
+                    break
+                await asyncio.sleep(settings.lambda_result_poll_interval_seconds)
+
+            results = []
+            for key in keys:
+                response = await asyncio.to_thread(self.s3_client.get_object, Bucket=self.bucket_name, Key=key)
+                results.append(json.loads(response['Body'].read()))
+
+            return {
+                'job_id': job_id,
+                'complete': len(results) >= expected_batches,
+                'batches': results
+            }
+
+        except Exception as e:
+            print(f"Error collecting processing results: {str(e)}")
+            return {'job_id': job_id, 'complete': False, 'batches': [], 'error': str(e)}
         
     async def list_documents(self) -> List[str]:
         try:
@@ -156,7 +328,7 @@ def lambda_handler(event, context):
             documents = []
             if 'Contents' in response:
                 for obj in response['Contents']:
-                    doc_id = obj['Key'].replace('documents/', '').replace('.json', '')
+                    doc_id = obj['Key'].replace('documents/', '').replace('.chunks', '').replace('.json', '')
                     documents.append(doc_id)
 
             return documents
@@ -165,22 +337,26 @@ def lambda_handler(event, context):
             print(f"Error listing documents: {str(e)}")
             return []
         
-    async def get_service_health(self) -> dict:
-        health_status = {
-            's3': False,
-            'lambda': False,
-        }
+    def probe_s3(self):
+        self.s3_client.head_bucket(Bucket=self.bucket_name)
 
-        try:
-            self.s3_client.head_bucket(Bucket=self.bucket_name)
-            health_status['s3'] = True
-        except:
-            pass
+    def probe_lambda(self):
+        # Looks up the one function we need instead of paging through list_functions
+        self.lambda_client.get_function(FunctionName=self.processor_function_name)
 
+    async def list_documents_modified_since(self, since: float) -> List[str]:
+        """IDs of documents written to S3 after the `since` Unix timestamp, oldest first"""
         try:
-            self.lambda_client.list_functions()
-            health_status['lambda'] = True
-        except:
-            pass
+            modified = []
+            paginator = self.s3_client.get_paginator('list_objects_v2')
+            for page in paginator.paginate(Bucket=self.bucket_name, Prefix='documents/'):
+                for obj in page.get('Contents', []):
+                    if obj['LastModified'].timestamp() > since:
+                        doc_id = obj['Key'].replace('documents/', '').replace('.chunks', '').replace('.json', '')
+                        modified.append((obj['LastModified'], doc_id))
 
-        return health_status
\ No newline at end of file
+            return [doc_id for _, doc_id in sorted(modified)]
+
+        except Exception as e:
+            print(f"Error listing modified documents: {str(e)}")
+            return []
@@ -0,0 +1,149 @@
+import io
+import json
+import zlib
+import shutil
+import struct
+import tempfile
+from typing import BinaryIO, Iterable, List, Tuple
+
+class ChunkContainer:
+    """Compressed chunk container: MAGIC | header length | JSON header | zlib chunks | zlib trailer.
+
+    The header lists each chunk's (offset, length) within the body, so a reader can
+    fetch the prefix and header once and then range-read any single chunk. What only
+    whole-document reads need (the joins) sits in the trailer, at the header's "trailer" range.
+    """
+    MAGIC = b"RAGC\x01"
+    PREFIX_SIZE = len(MAGIC) + 4
+    FALLBACK_CHUNK_SIZE = 2000
+
+    @staticmethod
+    def write(chunks: Iterable[str], out: BinaryIO, metadata: dict = None, content: str = None):
+        """Stream a container into `out`, consuming `chunks` once"""
+        with ChunkContainerWriter(metadata, content) as writer:
+            for chunk in chunks:
+                writer.add(chunk)
+            writer.finish(out)
+
+    @staticmethod
+    def build(chunks: Iterable[str], metadata: dict = None, content: str = None) -> bytes:
+        out = io.BytesIO()
+        ChunkContainer.write(chunks, out, metadata, content=content)
+        return out.getvalue()
+
+    @staticmethod
+    def split_fixed(content: str) -> List[str]:
+        """Used when the caller has no splitter chunks to store"""
+        size = ChunkContainer.FALLBACK_CHUNK_SIZE
+        return [content[i:i + size] for i in range(0, len(content), size)] or [""]
+
+    @staticmethod
+    def parse_prefix(prefix: bytes) -> int:
+        if len(prefix) < ChunkContainer.PREFIX_SIZE or not prefix.startswith(ChunkContainer.MAGIC):
+            raise ValueError("Not a chunk container")
+        return struct.unpack(">I", prefix[len(ChunkContainer.MAGIC):ChunkContainer.PREFIX_SIZE])[0]
+
+    @staticmethod
+    def parse_header(header_bytes: bytes) -> dict:
+        return json.loads(header_bytes.decode("utf-8"))
+
+    @staticmethod
+    def chunk_range(header: dict, header_length: int, chunk_id: int) -> Tuple[int, int]:
+        """Inclusive (start, end) byte positions of a chunk, ready for an HTTP Range header"""
+        if chunk_id < 0 or chunk_id >= len(header["chunks"]):
+            raise IndexError(f"Chunk {chunk_id} out of range")
+
+        return ChunkContainer._body_range(header_length, *header["chunks"][chunk_id])
+
+    @staticmethod
+    def _body_range(header_length: int, offset: int, length: int) -> Tuple[int, int]:
+        start = ChunkContainer.PREFIX_SIZE + header_length + offset
+        return start, start + length - 1
+
+    @staticmethod
+    def decode_chunk(data: bytes) -> str:
+        return zlib.decompress(data).decode("utf-8")
+
+    @staticmethod
+    def reassemble(chunks: List[str], trailer: dict) -> str:
+        if "joins" not in trailer:
+            return "\n".join(chunks)
+        return "".join(gap + chunk[skip:] for chunk, (skip, gap) in zip(chunks, trailer["joins"])) + trailer["tail"]
+
+    @staticmethod
+    def read_all(blob: bytes) -> Tuple[List[str], dict, dict]:
+        """(chunks, header, trailer); the trailer is empty for containers written without content"""
+        header_length = ChunkContainer.parse_prefix(blob[:ChunkContainer.PREFIX_SIZE])
+        header = ChunkContainer.parse_header(
+            blob[ChunkContainer.PREFIX_SIZE:ChunkContainer.PREFIX_SIZE + header_length]
+        )
+
+        chunks = []
+        for chunk_id in range(len(header["chunks"])):
+            start, end = ChunkContainer.chunk_range(header, header_length, chunk_id)
+            chunks.append(ChunkContainer.decode_chunk(blob[start:end + 1]))
+
+        trailer = {}
+        if "trailer" in header:
+            start, end = ChunkContainer._body_range(header_length, *header["trailer"])
+            trailer = json.loads(zlib.decompress(blob[start:end + 1]).decode("utf-8"))
+        elif "joins" in header:
+            trailer = {"joins": header["joins"], "tail": header["tail"]} # Written before joins moved to the trailer
+        return chunks, header, trailer
+
+
+class ChunkContainerWriter:
+    """Builds a ChunkContainer from chunks pushed one at a time, e.g. while they are being indexed.
+
+    Compressed chunks are spooled to a temporary file, so memory holds only the header,
+    whatever the document size. When `content` is given the trailer records joins,
+    which say how to stitch the (overlapping, whitespace-trimmed) splitter chunks back into it:
+    each join is [skip, gap], dropping `skip` leading characters already emitted by the
+    previous chunk or inserting `gap` text the splitter dropped between chunks.
+    """
+
+    def __init__(self, metadata: dict = None, content: str = None):
+        self.metadata = metadata or {}
+        self.content = content
+        self.offsets: List[List[int]] = []
+        self.joins: List[list] = []
+        self.body = tempfile.TemporaryFile()
+        self.body_size = 0
+        self.position, self.previous_start = 0, -1
+        self.joinable = content is not None
+
+    def add(self, chunk: str):
+        data = zlib.compress(chunk.encode("utf-8"))
+        self.body.write(data)
+        self.offsets.append([self.body_size, len(data)])
+        self.body_size += len(data)
+
+        if self.joinable:
+            start = self.content.find(chunk, self.previous_start + 1)
+            if start < 0:
+                self.joinable = False # Chunks are not verbatim slices of the content; reassembly falls back to newlines
+                return
+            self.joins.append([0, self.content[self.position:start]] if start >= self.position else [self.position - start, ""])
+            self.position = max(self.position, start + len(chunk))
+            self.previous_start = start
+
+    def finish(self, out: BinaryIO):
+        header_data = {"metadata": self.metadata, "chunks": self.offsets}
+        if self.joinable:
+            trailer = zlib.compress(json.dumps({"joins": self.joins, "tail": self.content[self.position:]}).encode("utf-8"))
+            self.body.write(trailer)
+            header_data["trailer"] = [self.body_size, len(trailer)]
+
+        header = json.dumps(header_data).encode("utf-8")
+        out.write(ChunkContainer.MAGIC + struct.pack(">I", len(header)) + header)
+        self.body.seek(0)
+        shutil.copyfileobj(self.body, out)
+
+    def close(self):
+        self.body.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
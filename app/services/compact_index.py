@@ -0,0 +1,310 @@
+import os
+import json
+import threading
+from typing import List, Optional, Tuple
+import numpy as np
+from app.services.vector_math import distance_from_similarity, normalize
+
+class CompactVectorIndex:
+    """float16 / product-quantized codes in memory, exact float32 vectors memory-mapped from disk for re-scoring"""
+
+    MODES = ("float16", "pq")
+    PQ_CENTROIDS = 256
+    BLOCK_SIZE = 65536
+
+    def __init__(
+        self,
+        directory: str,
+        mode: str = "float16",
+        pq_subvectors: int = 48,
+        pq_training_size: int = 10000,
+        rescore_factor: int = 4
+    ):
+        if mode not in self.MODES:
+            raise ValueError(f"Unsupported compact index mode: {mode}")
+
+        self.directory = directory
+        self.mode = mode
+        self.pq_subvectors = pq_subvectors
+        self.pq_training_size = pq_training_size
+        self.rescore_factor = max(1, rescore_factor)
+
+        self.dimension: Optional[int] = None
+        self.ids: List[str] = []
+        self._id_set = set()
+        self._codes: Optional[np.ndarray] = None # Over-allocated; rows past len(ids) are unused
+        self.codebooks: Optional[np.ndarray] = None # (subvectors, 256, sub_dimension)
+        self._exact: Optional[np.memmap] = None
+        self._lock = threading.Lock()
+        self._training: Optional[threading.Thread] = None
+
+        os.makedirs(self.directory, exist_ok=True)
+        self._load()
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    @property
+    def codes(self) -> Optional[np.ndarray]:
+        return None if self._codes is None else self._codes[:len(self.ids)]
+
+    def _codes_path(self) -> str:
+        # Separate files per encoding, so a codes file can never be read with the wrong row layout
+        return self._path("codes.pq" if self.codebooks is not None else "codes.f16")
+
+    def _code_layout(self) -> Tuple[np.dtype, int]:
+        if self.codebooks is not None:
+            return np.dtype(np.uint8), self.pq_subvectors
+        return np.dtype(np.float16), self.dimension
+
+    def _load(self):
+        index_path = self._path("index.json")
+        if not os.path.exists(index_path):
+            return
+
+        with open(index_path) as f:
+            index_data = json.load(f)
+
+        if index_data["mode"] != self.mode:
+            raise ValueError(
+                f"Compact index at {self.directory} was built in '{index_data['mode']}' mode, not '{self.mode}'"
+            )
+
+        self.dimension = index_data["dimension"]
+        if self.dimension is None:
+            return
+        if os.path.exists(self._path("codebooks.npy")) and os.path.exists(self._path("codes.pq")):
+            self.codebooks = np.load(self._path("codebooks.npy"))
+            if os.path.exists(self._path("codes.f16")):
+                os.remove(self._path("codes.f16")) # Left behind by a training run that stopped before cleanup
+
+        ids = []
+        if os.path.exists(self._path("ids.jsonl")):
+            with open(self._path("ids.jsonl")) as f:
+                ids = [json.loads(line) for line in f if line.strip()]
+
+        # The three append-only files are written in turn, so an interrupted add can leave one a few rows ahead
+        vector_rows = os.path.getsize(self._path("vectors.f32")) // (4 * self.dimension) if os.path.exists(self._path("vectors.f32")) else 0
+        count = min(len(ids), vector_rows)
+
+        dtype, width = self._code_layout()
+        codes = np.fromfile(self._codes_path(), dtype=dtype) if os.path.exists(self._codes_path()) else np.empty(0, dtype=dtype)
+        codes = codes[:len(codes) // width * width].reshape(-1, width)[:count]
+
+        self.ids = ids[:count]
+        self._id_set = set(self.ids)
+        self._codes = codes
+        if len(codes) < count:
+            self._codes = np.concatenate([codes, self._encode(np.asarray(self._exact_vectors()[len(codes):count]))])
+
+        with open(self._path("ids.jsonl"), "w") as f:
+            f.writelines(json.dumps(chunk_id) + "\n" for chunk_id in self.ids)
+        if vector_rows > count:
+            with open(self._path("vectors.f32"), "r+b") as f:
+                f.truncate(count * 4 * self.dimension)
+        self.codes.tofile(self._codes_path())
+
+    def _save_header(self):
+        with open(self._path("index.json"), "w") as f:
+            json.dump({"mode": self.mode, "dimension": self.dimension}, f)
+
+    def _append_codes(self, new_codes: np.ndarray):
+        count = len(self.ids)
+        if self._codes is None or count + len(new_codes) > len(self._codes):
+            # Grow by doubling so appends stay amortized O(batch) instead of copying every code each time
+            capacity = max(1024, count + len(new_codes), 2 * (len(self._codes) if self._codes is not None else 0))
+            grown = np.empty((capacity, new_codes.shape[1]), dtype=new_codes.dtype)
+            if count:
+                grown[:count] = self._codes[:count]
+            self._codes = grown
+        self._codes[count:count + len(new_codes)] = new_codes
+
+    def _exact_vectors(self) -> np.memmap:
+        if self._exact is None or len(self._exact) != len(self.ids):
+            # Re-map whenever rows were appended so they become visible
+            self._exact = np.memmap(
+                self._path("vectors.f32"),
+                dtype=np.float32,
+                mode="r",
+                shape=(len(self.ids), self.dimension)
+            )
+        return self._exact
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __contains__(self, chunk_id: str) -> bool:
+        return chunk_id in self._id_set
+
+    def add(self, ids: List[str], embeddings: List[List[float]]):
+        """Append vectors; ids already in the index are skipped, so replaying a batch is harmless"""
+        with self._lock:
+            rows, batch_ids = [], set()
+            for position, chunk_id in enumerate(ids):
+                if chunk_id not in self._id_set and chunk_id not in batch_ids:
+                    rows.append(position)
+                    batch_ids.add(chunk_id)
+            if not rows:
+                return
+
+            ids = [ids[position] for position in rows]
+            vectors = normalize(np.asarray(embeddings, dtype=np.float32)[rows])
+            if self.dimension is None:
+                self.dimension = vectors.shape[1]
+                if self.mode == "pq" and self.dimension % self.pq_subvectors != 0:
+                    raise ValueError(
+                        f"Embedding dimension {self.dimension} is not divisible by {self.pq_subvectors} PQ subvectors"
+                    )
+                self._save_header()
+
+            new_codes = self._encode(vectors)
+            with open(self._path("vectors.f32"), "ab") as f:
+                f.write(vectors.tobytes())
+            with open(self._codes_path(), "ab") as f:
+                f.write(new_codes.tobytes())
+            with open(self._path("ids.jsonl"), "a") as f:
+                f.writelines(json.dumps(chunk_id) + "\n" for chunk_id in ids)
+
+            self._append_codes(new_codes)
+            self.ids.extend(ids)
+            self._id_set.update(ids)
+
+            if self.mode == "pq" and self.codebooks is None and len(self.ids) >= self.pq_training_size and self._training is None:
+                # Training takes seconds; run it beside the upload so searches and adds keep going meanwhile
+                self._training = threading.Thread(target=self.train, name="compact-index-train", daemon=True)
+                self._training.start()
+
+    def wait_for_training(self, timeout: Optional[float] = None):
+        training = self._training
+        if training is not None:
+            training.join(timeout)
+
+    def _encode(self, vectors: np.ndarray, codebooks: Optional[np.ndarray] = None) -> np.ndarray:
+        codebooks = self.codebooks if codebooks is None else codebooks
+        if codebooks is None:
+            # float16 mode, or pq mode that has not seen enough vectors to train yet
+            return vectors.astype(np.float16)
+
+        subvectors = vectors.reshape(len(vectors), self.pq_subvectors, -1)
+        codes = np.empty((len(vectors), self.pq_subvectors), dtype=np.uint8)
+        for m in range(self.pq_subvectors):
+            centroids = codebooks[m]
+            distances = (
+                (subvectors[:, m, :] ** 2).sum(axis=1, keepdims=True)
+                - 2 * subvectors[:, m, :] @ centroids.T
+                + (centroids ** 2).sum(axis=1)
+            )
+            codes[:, m] = distances.argmin(axis=1)
+        return codes
+
+    def _encode_rows(self, exact: np.memmap, start: int, end: int, codebooks: np.ndarray) -> np.ndarray:
+        return np.concatenate([
+            self._encode(np.asarray(exact[block:min(block + self.BLOCK_SIZE, end)]), codebooks)
+            for block in range(start, end, self.BLOCK_SIZE)
+        ] or [np.empty((0, self.pq_subvectors), dtype=np.uint8)])
+
+    def train(self, iterations: int = 15, seed: int = 0):
+        """Fit PQ codebooks on a sample of the exact vectors and re-encode everything.
+
+        Fitting and re-encoding run outside the lock on the rows present at the start; only the
+        rows added meanwhile are encoded under the lock before the new codes are swapped in.
+        """
+        try:
+            with self._lock:
+                if self.mode != "pq" or not self.ids or self.codebooks is not None:
+                    return
+                count, exact = len(self.ids), self._exact_vectors()
+
+            rng = np.random.default_rng(seed)
+            sample_rows = np.sort(rng.choice(count, size=min(count, self.pq_training_size), replace=False))
+            sample = np.asarray(exact[sample_rows]).reshape(len(sample_rows), self.pq_subvectors, -1)
+
+            centroid_count = min(self.PQ_CENTROIDS, len(sample_rows))
+            codebooks = np.zeros((self.pq_subvectors, self.PQ_CENTROIDS, sample.shape[2]), dtype=np.float32)
+            for m in range(self.pq_subvectors):
+                points = np.ascontiguousarray(sample[:, m, :])
+                centroids = points[rng.choice(len(points), size=centroid_count, replace=False)].copy()
+                for _ in range(iterations):
+                    # |p|^2 is the same for every centroid, so it cannot change the argmin
+                    assignments = ((centroids ** 2).sum(axis=1) - 2 * points @ centroids.T).argmin(axis=1)
+                    sizes = np.bincount(assignments, minlength=centroid_count)
+                    sums = np.stack([
+                        np.bincount(assignments, weights=points[:, d], minlength=centroid_count)
+                        for d in range(points.shape[1])
+                    ], axis=1)
+                    occupied = sizes > 0
+                    centroids[occupied] = sums[occupied] / sizes[occupied, None]
+                codebooks[m, :centroid_count] = centroids
+                # Unused slots repeat the first centroid so they can never win an argmin tie on their own
+                codebooks[m, centroid_count:] = centroids[0]
+
+            codes = self._encode_rows(exact, 0, count, codebooks)
+
+            with self._lock:
+                if self.codebooks is not None:
+                    return # Another training run finished first
+                total = len(self.ids)
+                codes = np.concatenate([codes, self._encode_rows(self._exact_vectors(), count, total, codebooks)])
+
+                # Codes first, codebooks second: the index only counts as trained once both are in place
+                codes.tofile(self._path("codes.pq.tmp"))
+                os.replace(self._path("codes.pq.tmp"), self._path("codes.pq"))
+                np.save(self._path("codebooks.tmp.npy"), codebooks)
+                os.replace(self._path("codebooks.tmp.npy"), self._path("codebooks.npy"))
+
+                previous_codes_path = self._codes_path()
+                self.codebooks = codebooks
+                self._codes = codes
+                if os.path.exists(previous_codes_path):
+                    os.remove(previous_codes_path)
+        except Exception as e:
+            print(f"Error training compact index: {e}")
+        finally:
+            if self._training is threading.current_thread():
+                self._training = None
+
+    @staticmethod
+    def _approximate_scores(query: np.ndarray, codes: np.ndarray, codebooks: Optional[np.ndarray]) -> np.ndarray:
+        scores = np.empty(len(codes), dtype=np.float32)
+
+        if codebooks is None:
+            for start in range(0, len(codes), CompactVectorIndex.BLOCK_SIZE):
+                block = codes[start:start + CompactVectorIndex.BLOCK_SIZE].astype(np.float32)
+                scores[start:start + len(block)] = block @ query
+            return scores
+
+        # Asymmetric distance computation: one lookup table per query, then gathers only
+        lookup = np.einsum("mcd,md->mc", codebooks, query.reshape(len(codebooks), -1))
+        subvector_index = np.arange(len(codebooks))
+        for start in range(0, len(codes), CompactVectorIndex.BLOCK_SIZE):
+            block = codes[start:start + CompactVectorIndex.BLOCK_SIZE]
+            scores[start:start + len(block)] = lookup[subvector_index, block].sum(axis=1)
+        return scores
+
+    def search(self, query_embedding: List[float], k: int = 3) -> List[Tuple[str, float]]:
+        """Return (id, distance) pairs, using squared L2 on unit vectors like Chroma's default space"""
+        with self._lock:
+            # Appends only write past the current row count and growth or training swap in new arrays,
+            # so this view stays consistent once the lock is released
+            count = len(self.ids)
+            if count == 0 or k <= 0:
+                return []
+            codes, codebooks, exact = self.codes, self.codebooks, self._exact_vectors()
+
+        query = normalize(np.asarray(query_embedding, dtype=np.float32))
+        approximate = self._approximate_scores(query, codes, codebooks)
+
+        candidate_count = min(count, k * self.rescore_factor)
+        candidates = np.argpartition(-approximate, candidate_count - 1)[:candidate_count]
+        candidates.sort() # Ascending row order keeps the memory-mapped reads sequential
+
+        similarities = np.asarray(exact[candidates]) @ query
+        top = np.argsort(-similarities)[:k]
+
+        return [(self.ids[candidates[i]], float(distance_from_similarity(similarities[i]))) for i in top]
+
+    def memory_bytes(self) -> int:
+        total = self.codes.nbytes if self.codes is not None else 0
+        if self.codebooks is not None:
+            total += self.codebooks.nbytes
+        return total
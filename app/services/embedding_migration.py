@@ -0,0 +1,156 @@
+import os
+import json
+import time
+import asyncio
+from contextlib import nullcontext
+from typing import Awaitable, Callable, Optional
+from langchain.schema.embeddings import Embeddings
+
+class EmbeddingMigration:
+    """Re-embeds every chunk of one Chroma collection into another, rate-limited and resumable"""
+
+    def __init__(
+        self,
+        chroma_client,
+        source_collection: str,
+        target_collection: str,
+        model_name: str,
+        embeddings: Embeddings,
+        checkpoint_path: str,
+        rate_limit_per_second: float = 50.0,
+        batch_size: int = 64
+    ):
+        self.chroma_client = chroma_client
+        self.source_collection = source_collection
+        self.target_collection = target_collection
+        self.model_name = model_name
+        self.embeddings = embeddings
+        self.checkpoint_path = checkpoint_path
+        self.rate_limit_per_second = rate_limit_per_second
+        self.batch_size = batch_size
+
+        self.status = "pending"
+        self.offset = 0
+        self.migrated = 0
+        self.total = 0
+        self.error: Optional[str] = None
+        self.started_at: Optional[float] = None
+        self.completed_at: Optional[float] = None
+        self.last_batch_per_second = 0.0
+        self._session_migrated = 0
+        self._task: Optional[asyncio.Task] = None
+
+        self._load_checkpoint()
+
+    @staticmethod
+    def read_checkpoint(checkpoint_path: str) -> Optional[dict]:
+        if not os.path.exists(checkpoint_path):
+            return None
+        with open(checkpoint_path) as f:
+            return json.load(f)
+
+    def _load_checkpoint(self):
+        checkpoint = self.read_checkpoint(self.checkpoint_path)
+        if not checkpoint or checkpoint.get("target_collection") != self.target_collection:
+            return
+
+        # Resume where the last run stopped; earlier batches are already in the target collection
+        self.offset = checkpoint["offset"]
+        self.migrated = checkpoint["migrated"]
+
+    def _save_checkpoint(self):
+        os.makedirs(os.path.dirname(self.checkpoint_path) or ".", exist_ok=True)
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({
+                "source_collection": self.source_collection,
+                "target_collection": self.target_collection,
+                "model_name": self.model_name,
+                "status": self.status,
+                "offset": self.offset,
+                "migrated": self.migrated,
+                "rate_limit_per_second": self.rate_limit_per_second,
+                "batch_size": self.batch_size,
+                "updated_at": time.time()
+            }, f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    @property
+    def running(self) -> bool:
+        return self.status == "running"
+
+    def get_status(self) -> dict:
+        elapsed = (self.completed_at or time.time()) - self.started_at if self.started_at else 0.0
+        return {
+            "status": self.status,
+            "model_name": self.model_name,
+            "source_collection": self.source_collection,
+            "target_collection": self.target_collection,
+            "migrated": self.migrated,
+            "total": self.total,
+            "progress": self.migrated / self.total if self.total else 0.0,
+            "chunks_per_second": self._session_migrated / elapsed if elapsed else 0.0,
+            "last_batch_chunks_per_second": self.last_batch_per_second,
+            "rate_limit_per_second": self.rate_limit_per_second,
+            "error": self.error
+        }
+
+    def start(self, on_complete: Callable[["EmbeddingMigration"], Awaitable[None]], write_gate=None) -> asyncio.Task:
+        # Marked running before the task is scheduled, so writes made right after this are dual-written
+        self.status = "running"
+        self.started_at = time.time()
+        self._save_checkpoint()
+        self._task = asyncio.create_task(self._run(on_complete, write_gate))
+        return self._task
+
+    async def _run(self, on_complete: Callable[["EmbeddingMigration"], Awaitable[None]], write_gate=None):
+        try:
+            source = self.chroma_client.get_collection(self.source_collection)
+            target = self.chroma_client.get_or_create_collection(self.target_collection)
+
+            # Chroma re-scans from the start for every offset, so list the ids once and fetch pages by id.
+            # Chunks written after this point are dual-written and don't need to be in the list.
+            ids = (await asyncio.to_thread(source.get, include=[]))["ids"]
+            self.total = len(ids)
+
+            while self.offset < len(ids):
+                page_ids = ids[self.offset:self.offset + self.batch_size]
+                page = await asyncio.to_thread(source.get, ids=page_ids, include=["documents", "metadatas"])
+
+                batch_started = time.perf_counter()
+                if page["ids"]:
+                    vectors = await asyncio.to_thread(self.embeddings.embed_documents, page["documents"])
+                    await asyncio.to_thread(
+                        target.upsert,
+                        ids=page["ids"],
+                        embeddings=vectors,
+                        documents=page["documents"],
+                        metadatas=page["metadatas"]
+                    )
+
+                self.offset += len(page_ids)
+                self.migrated += len(page["ids"])
+                self._session_migrated += len(page["ids"])
+                self._save_checkpoint()
+
+                batch_seconds = time.perf_counter() - batch_started
+                self.last_batch_per_second = len(page["ids"]) / batch_seconds if batch_seconds else 0.0
+
+                # Hold the long-run rate at the limit so the migration never starves live queries
+                if self.rate_limit_per_second > 0:
+                    budget_seconds = len(page["ids"]) / self.rate_limit_per_second
+                    if budget_seconds > batch_seconds:
+                        await asyncio.sleep(budget_seconds - batch_seconds)
+
+            # Switch with writes frozen, so no upload has some batches in each collection
+            async with write_gate.frozen() if write_gate is not None else nullcontext():
+                await on_complete(self)
+                self.status = "completed"
+                self.completed_at = time.time()
+                self._save_checkpoint()
+
+        except Exception as e:
+            print(f"Error migrating embeddings: {e}")
+            self.status = "failed"
+            self.error = str(e)
+            self._save_checkpoint()
@@ -0,0 +1,78 @@
+import time
+import asyncio
+from typing import Callable, Dict, Optional
+
+class HealthProber:
+    """Probes backends on an interval so /health can answer from a cached snapshot"""
+
+    def __init__(self, probes: Dict[str, Callable[[], Optional[dict]]], interval_seconds: float = 15.0, timeout_seconds: float = 2.0):
+        self.probes = probes
+        self.interval_seconds = interval_seconds
+        self.timeout_seconds = timeout_seconds
+
+        self.results: Dict[str, dict] = {}
+        self.checked_at: Optional[float] = None
+        self._checked_monotonic: Optional[float] = None
+        self._in_flight: set = set()
+        self._task: Optional[asyncio.Task] = None
+
+    async def _probe(self, name: str, probe: Callable[[], Optional[dict]]) -> dict:
+        if name in self._in_flight:
+            # A timed-out probe's thread may still be blocked; don't stack another one on it
+            return {"healthy": False, "latency_us": None, "error": "previous probe still running"}
+
+        self._in_flight.add(name)
+        started = time.perf_counter()
+        thread = asyncio.ensure_future(asyncio.to_thread(probe))
+        thread.add_done_callback(lambda _: self._in_flight.discard(name))
+        try:
+            detail = await asyncio.wait_for(asyncio.shield(thread), self.timeout_seconds)
+            result = {"healthy": True, "latency_us": int((time.perf_counter() - started) * 1_000_000), "error": None}
+            if detail:
+                result["detail"] = detail
+            return result
+        except asyncio.TimeoutError:
+            return {"healthy": False, "latency_us": int((time.perf_counter() - started) * 1_000_000), "error": "timed out"}
+        except Exception as e:
+            return {"healthy": False, "latency_us": int((time.perf_counter() - started) * 1_000_000), "error": str(e)}
+
+    async def probe_all(self):
+        names = list(self.probes)
+        results = await asyncio.gather(*(self._probe(name, self.probes[name]) for name in names))
+        self.results = dict(zip(names, results))
+        self.checked_at = time.time()
+        self._checked_monotonic = time.monotonic()
+
+    async def _run(self):
+        while True:
+            try:
+                await self.probe_all()
+            except Exception as e:
+                print(f"Error probing service health: {e}")
+            await asyncio.sleep(self.interval_seconds)
+
+    def start(self) -> asyncio.Task:
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+        return self._task
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def get_snapshot(self) -> dict:
+        if self.checked_at is None:
+            return {"status": "starting", "checked_at": None, "staleness_us": None, "probes": {}}
+
+        healthy = all(result["healthy"] for result in self.results.values())
+        return {
+            "status": "healthy" if healthy else "degraded",
+            "checked_at": self.checked_at,
+            "staleness_us": int((time.monotonic() - self._checked_monotonic) * 1_000_000),
+            "probes": self.results
+        }
@@ -0,0 +1,240 @@
+import os
+import json
+import time
+import shutil
+import asyncio
+import hashlib
+import tarfile
+import tempfile
+from contextlib import asynccontextmanager
+from datetime import datetime, timezone
+from typing import Dict, Optional, Tuple
+from app.core.config import settings
+
+class WriteGate:
+    """Index writes run concurrently; a snapshot waits for them to drain and holds new ones back"""
+
+    def __init__(self):
+        self._writers = 0
+        self._frozen = False
+        self._condition = asyncio.Condition()
+
+    @asynccontextmanager
+    async def writing(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: not self._frozen)
+            self._writers += 1
+        try:
+            yield
+        finally:
+            async with self._condition:
+                self._writers -= 1
+                self._condition.notify_all()
+
+    @asynccontextmanager
+    async def frozen(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: not self._frozen)
+            self._frozen = True
+            await self._condition.wait_for(lambda: self._writers == 0)
+        try:
+            yield
+        finally:
+            async with self._condition:
+                self._frozen = False
+                self._condition.notify_all()
+
+class IndexSnapshots:
+    """Checksummed tar.gz snapshots of the vector index and its side indexes, kept locally or in S3"""
+
+    MANIFEST = "manifest.json"
+    LATEST = "latest.json"
+
+    def __init__(self, location: str, s3_client=None):
+        self.location = location
+        self.s3_client = s3_client
+
+    @staticmethod
+    def components() -> Dict[str, str]:
+        """Archive name -> local path for everything a node needs to serve queries"""
+        components = {"chroma": settings.chroma_persist_direcotry}
+        if settings.vector_backend == "numpy":
+            components["numpy_store"] = settings.numpy_store_directory
+        if settings.compact_index_enabled:
+            components["compact_index"] = settings.compact_index_directory
+        if settings.near_duplicate_detection:
+            components["near_duplicates.jsonl"] = settings.near_duplicate_index_path
+        return components
+
+    @staticmethod
+    def _configuration() -> dict:
+        # A snapshot only makes sense on a node laid out the same way
+        return {
+            "vector_backend": settings.vector_backend,
+            "vector_shard_count": settings.vector_shard_count,
+            "tenant_isolation": settings.tenant_isolation,
+            "compact_index_mode": settings.compact_index_mode if settings.compact_index_enabled else None
+        }
+
+    @staticmethod
+    def _sha256(path: str) -> str:
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    @staticmethod
+    def _is_s3(location: str) -> bool:
+        return location.startswith("s3://")
+
+    def _s3_target(self, name: str) -> Tuple[str, str]:
+        bucket, _, prefix = self.location[len("s3://"):].partition("/")
+        return bucket, f"{prefix.rstrip('/')}/{name}" if prefix else name
+
+    def _put(self, local_path: str, name: str):
+        if self._is_s3(self.location):
+            bucket, key = self._s3_target(name)
+            self.s3_client.upload_file(local_path, bucket, key)
+        else:
+            os.makedirs(self.location, exist_ok=True)
+            shutil.copyfile(local_path, os.path.join(self.location, name))
+
+    def _get(self, name: str, local_path: str):
+        if self._is_s3(self.location):
+            bucket, key = self._s3_target(name)
+            self.s3_client.download_file(bucket, key, local_path)
+        else:
+            shutil.copyfile(os.path.join(self.location, name), local_path)
+
+    def stage(self, staging_dir: str, created_at: float) -> dict:
+        """Copy every component into `staging_dir` and write its manifest; run while writes are frozen"""
+        files = {}
+        for name, source in self.components().items():
+            if not os.path.exists(source):
+                continue
+            target = os.path.join(staging_dir, name)
+            if os.path.isdir(source):
+                shutil.copytree(source, target)
+            else:
+                shutil.copy2(source, target)
+
+        for root, _, filenames in os.walk(staging_dir):
+            for filename in filenames:
+                path = os.path.join(root, filename)
+                files[os.path.relpath(path, staging_dir)] = self._sha256(path)
+
+        manifest = {
+            "created_at": created_at,
+            "configuration": self._configuration(),
+            "components": sorted(name for name in self.components() if os.path.exists(os.path.join(staging_dir, name))),
+            "files": files
+        }
+        with open(os.path.join(staging_dir, self.MANIFEST), "w") as f:
+            json.dump(manifest, f)
+        return manifest
+
+    def publish(self, staging_dir: str, manifest: dict) -> dict:
+        """Compress a staged copy, checksum it and upload it as the latest snapshot"""
+        stamp = datetime.fromtimestamp(manifest["created_at"], tz=timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        name = f"index-snapshot-{stamp}.tar.gz"
+
+        with tempfile.TemporaryDirectory() as work_dir:
+            archive_path = os.path.join(work_dir, name)
+            with tarfile.open(archive_path, "w:gz") as archive:
+                # Manifest first, so a reader can check the layout before extracting anything else
+                archive.add(os.path.join(staging_dir, self.MANIFEST), arcname=self.MANIFEST)
+                for entry in sorted(os.listdir(staging_dir)):
+                    if entry != self.MANIFEST:
+                        archive.add(os.path.join(staging_dir, entry), arcname=entry)
+
+            pointer = {
+                "name": name,
+                "sha256": self._sha256(archive_path),
+                "size_bytes": os.path.getsize(archive_path),
+                "created_at": manifest["created_at"],
+                "files": len(manifest["files"])
+            }
+            self._put(archive_path, name)
+
+            pointer_path = os.path.join(work_dir, self.LATEST)
+            with open(pointer_path, "w") as f:
+                json.dump(pointer, f)
+            # The pointer goes last, so readers never see a snapshot that is still uploading
+            self._put(pointer_path, self.LATEST)
+
+        return {**pointer, "location": self.location}
+
+    async def create(self, write_gate: WriteGate) -> dict:
+        if settings.vector_shard_hosts:
+            raise ValueError("Snapshots cover local indexes only; remote shard hosts must be snapshotted separately")
+
+        with tempfile.TemporaryDirectory() as staging_dir:
+            # Only the local copy happens under the freeze; compression and upload run while writes resume
+            async with write_gate.frozen():
+                manifest = await asyncio.to_thread(self.stage, staging_dir, time.time())
+            return await asyncio.to_thread(self.publish, staging_dir, manifest)
+
+    def latest(self) -> Optional[dict]:
+        try:
+            with tempfile.TemporaryDirectory() as work_dir:
+                pointer_path = os.path.join(work_dir, self.LATEST)
+                self._get(self.LATEST, pointer_path)
+                with open(pointer_path) as f:
+                    return json.load(f)
+        except Exception as e:
+            print(f"Error reading latest snapshot: {e}")
+            return None
+
+    @staticmethod
+    def _has_local_index() -> bool:
+        for path in IndexSnapshots.components().values():
+            if os.path.isfile(path):
+                return True
+            if any(files for _, _, files in os.walk(path)):
+                return True
+        return False
+
+    def restore_latest(self) -> Optional[dict]:
+        """Install the latest snapshot on an empty node; returns its manifest, or None if nothing was restored"""
+        if self._has_local_index():
+            print("Local index already present, skipping snapshot restore")
+            return None
+
+        pointer = self.latest()
+        if pointer is None:
+            return None
+
+        with tempfile.TemporaryDirectory() as work_dir:
+            archive_path = os.path.join(work_dir, pointer["name"])
+            self._get(pointer["name"], archive_path)
+            if self._sha256(archive_path) != pointer["sha256"]:
+                raise ValueError(f"Snapshot {pointer['name']} failed its checksum")
+
+            extract_dir = os.path.join(work_dir, "extract")
+            with tarfile.open(archive_path, "r:gz") as archive:
+                for member in archive.getmembers():
+                    target = os.path.realpath(os.path.join(extract_dir, member.name))
+                    if not target.startswith(os.path.realpath(extract_dir) + os.sep) or not (member.isfile() or member.isdir()):
+                        raise ValueError(f"Unsafe entry in snapshot: {member.name}")
+                archive.extractall(extract_dir)
+
+            with open(os.path.join(extract_dir, self.MANIFEST)) as f:
+                manifest = json.load(f)
+            if manifest["configuration"] != self._configuration():
+                raise ValueError(f"Snapshot was taken with {manifest['configuration']}, this node runs {self._configuration()}")
+            for relative_path, checksum in manifest["files"].items():
+                if self._sha256(os.path.join(extract_dir, relative_path)) != checksum:
+                    raise ValueError(f"Snapshot file {relative_path} failed its checksum")
+
+            for name, target in self.components().items():
+                source = os.path.join(extract_dir, name)
+                if not os.path.exists(source):
+                    continue
+                if os.path.isdir(target):
+                    shutil.rmtree(target)
+                os.makedirs(os.path.dirname(os.path.abspath(target)), exist_ok=True)
+                shutil.move(source, target)
+
+        print(f"Restored index snapshot {pointer['name']}")
+        return manifest
@@ -0,0 +1,64 @@
+import gc
+import os
+import resource
+from typing import Iterator, List, Optional
+
+class ChunkRecord:
+    """One chunk awaiting embedding; metadata is shared per document and only expanded at write time"""
+
+    __slots__ = ("text", "document_index", "chunk_id", "vector_id")
+
+    def __init__(self, text: str, document_index: int, chunk_id: int, vector_id: str):
+        self.text = text
+        self.document_index = document_index
+        self.chunk_id = chunk_id
+        self.vector_id = vector_id
+
+class MemoryGovernor:
+    """Adapts the ingest batch size so resident memory stays under a ceiling"""
+
+    def __init__(self, ceiling_mb: int, max_batch_size: int):
+        self.ceiling_bytes = ceiling_mb * 1024 * 1024
+        self.max_batch_size = max_batch_size
+        self.batch_size = max_batch_size
+        self.min_batch_size = max(1, max_batch_size // 8) # Below this, per-call overhead outweighs the memory saved
+        self.peak_rss = 0
+
+    @staticmethod
+    def current_rss() -> int:
+        try:
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, ValueError):
+            # No procfs (macOS): fall back to the peak, which is at least an upper bound
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    def after_batch(self) -> int:
+        """Record RSS after a batch and return the size to use for the next one"""
+        rss = self.current_rss()
+        self.peak_rss = max(self.peak_rss, rss)
+        if not self.ceiling_bytes:
+            return self.batch_size
+
+        if rss > self.ceiling_bytes and self.batch_size > self.min_batch_size:
+            # A full collection is costly, so only pay for it while there is still room to shrink
+            gc.collect()
+            self.batch_size = max(self.min_batch_size, self.batch_size // 2)
+        elif rss < self.ceiling_bytes * 0.75 and self.batch_size < self.max_batch_size:
+            self.batch_size = min(self.max_batch_size, self.batch_size * 2)
+        return self.batch_size
+
+def iter_windows(text: str, window_chars: int, separators: Optional[List[str]] = None) -> Iterator[str]:
+    """Yield consecutive slices of at most `window_chars`, cut at the last separator where possible"""
+    separators = separators or ["\n\n", "\n", " "]
+    start = 0
+    while start < len(text):
+        end = min(start + window_chars, len(text))
+        if end < len(text):
+            for separator in separators:
+                cut = text.rfind(separator, start, end)
+                if cut > start:
+                    end = cut + len(separator)
+                    break
+        yield text[start:end]
+        start = end
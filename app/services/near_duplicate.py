@@ -0,0 +1,171 @@
+import os
+import re
+import json
+import hashlib
+import threading
+import numpy as np
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+class NearDuplicateIndex:
+    """MinHash/LSH over word shingles that links near-identical chunks to one stored vector"""
+
+    MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+    WORD_PATTERN = re.compile(r"\w+")
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        num_perm: int = 128,
+        bands: int = 16,
+        threshold: float = 0.85,
+        shingle_size: int = 5,
+        seed: int = 1
+    ):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+
+        self.path = path
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+
+        rng = np.random.RandomState(seed)
+        self.a = rng.randint(1, int(self.MERSENNE_PRIME), size=num_perm, dtype=np.uint64)
+        self.b = rng.randint(0, int(self.MERSENNE_PRIME), size=num_perm, dtype=np.uint64)
+
+        self.buckets: Dict[Tuple[str, int, bytes], List[str]] = defaultdict(list)
+        self.signatures: Dict[str, np.ndarray] = {}
+        self.references: Dict[str, List[dict]] = defaultdict(list)
+        self.duplicates_linked = 0
+        self._lock = threading.Lock()
+
+        self._load()
+
+    def signature(self, text: str) -> Optional[np.ndarray]:
+        words = self.WORD_PATTERN.findall(text.lower())
+        if not words:
+            return None
+
+        size = min(self.shingle_size, len(words))
+        shingles = {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+        hashes = np.fromiter(
+            (int.from_bytes(hashlib.blake2b(shingle.encode("utf-8"), digest_size=4).digest(), "little") for shingle in shingles),
+            dtype=np.uint64,
+            count=len(shingles)
+        )
+
+        # uint64 wraparound in a*x is fine here; it is still a valid universal hash family
+        permuted = (np.outer(hashes, self.a) + self.b) % self.MERSENNE_PRIME
+        return (permuted.min(axis=0) & np.uint64(0xFFFFFFFF)).astype(np.uint32)
+
+    def _band_keys(self, namespace: str, signature: np.ndarray) -> List[Tuple[str, int, bytes]]:
+        return [
+            (namespace, band, signature[band * self.rows:(band + 1) * self.rows].tobytes())
+            for band in range(self.bands)
+        ]
+
+    def _best_match(self, keys, signature, buckets, signatures) -> Optional[str]:
+        best_id, best_similarity = None, self.threshold
+        seen = set()
+        for key in keys:
+            for candidate in buckets.get(key, ()):
+                if candidate in seen:
+                    continue
+                seen.add(candidate)
+                similarity = float(np.mean(signatures[candidate] == signature))
+                if similarity >= best_similarity:
+                    best_id, best_similarity = candidate, similarity
+        return best_id
+
+    def plan(self, namespace: str, texts: List[str], ids: List[str]) -> Tuple[List[int], Dict[int, str], Dict[str, np.ndarray]]:
+        """Split a batch into positions to embed and positions that duplicate an existing or earlier chunk.
+
+        Nothing is recorded until commit(), so a failed vector write leaves the index untouched.
+        """
+        keep: List[int] = []
+        links: Dict[int, str] = {}
+        new_signatures: Dict[str, np.ndarray] = {}
+        batch_buckets: Dict[Tuple[str, int, bytes], List[str]] = defaultdict(list)
+
+        with self._lock:
+            for position, (text, chunk_id) in enumerate(zip(texts, ids)):
+                signature = self.signature(text)
+                if signature is None:
+                    keep.append(position)
+                    continue
+
+                keys = self._band_keys(namespace, signature)
+                canonical = (
+                    self._best_match(keys, signature, self.buckets, self.signatures)
+                    or self._best_match(keys, signature, batch_buckets, new_signatures)
+                )
+                if canonical is not None:
+                    links[position] = canonical
+                    continue
+
+                keep.append(position)
+                new_signatures[chunk_id] = signature
+                for key in keys:
+                    batch_buckets[key].append(chunk_id)
+
+        return keep, links, new_signatures
+
+    def commit(self, namespace: str, signatures: Dict[str, np.ndarray], references: List[Tuple[str, dict]]):
+        """Record newly stored chunks and the duplicates that now point at them"""
+        records = []
+        with self._lock:
+            for chunk_id, signature in signatures.items():
+                self._add_signature(namespace, chunk_id, signature)
+                records.append({"op": "chunk", "namespace": namespace, "id": chunk_id, "signature": signature.tobytes().hex()})
+            for canonical_id, metadata in references:
+                if metadata.get("document_id") is not None and any(
+                    (known.get("document_id"), known.get("chunk_id")) == (metadata["document_id"], metadata.get("chunk_id"))
+                    for known in self.references[canonical_id]
+                ):
+                    continue # Same chunk of the same document, indexed again
+                self.references[canonical_id].append(metadata)
+                self.duplicates_linked += 1
+                records.append({"op": "reference", "id": canonical_id, "metadata": metadata})
+
+            if self.path and records:
+                with open(self.path, "a") as f:
+                    f.writelines(json.dumps(record) + "\n" for record in records)
+
+    def _add_signature(self, namespace: str, chunk_id: str, signature: np.ndarray):
+        self.signatures[chunk_id] = signature
+        for key in self._band_keys(namespace, signature):
+            self.buckets[key].append(chunk_id)
+
+    def _load(self):
+        if not self.path:
+            return
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        if not os.path.exists(self.path):
+            return
+
+        with open(self.path) as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                record = json.loads(line)
+                if record["op"] == "chunk":
+                    signature = np.frombuffer(bytes.fromhex(record["signature"]), dtype=np.uint32)
+                    self._add_signature(record["namespace"], record["id"], signature)
+                else:
+                    self.references[record["id"]].append(record["metadata"])
+                    self.duplicates_linked += 1
+
+    def references_for(self, chunk_id: Optional[str]) -> List[dict]:
+        return self.references.get(chunk_id, []) if chunk_id else []
+
+    def report(self) -> dict:
+        chunks_seen = len(self.signatures) + self.duplicates_linked
+        return {
+            "chunks_seen": chunks_seen,
+            "chunks_indexed": len(self.signatures),
+            "duplicates_linked": self.duplicates_linked,
+            "vectors_saved": self.duplicates_linked,
+            "saved_ratio": self.duplicates_linked / chunks_seen if chunks_seen else 0.0
+        }
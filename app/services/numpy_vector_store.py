@@ -0,0 +1,327 @@
+import os
+import json
+import uuid
+import threading
+from typing import Any, Callable, Iterable, List, Optional, Tuple
+import numpy as np
+from langchain.schema import Document
+from langchain.schema.embeddings import Embeddings
+from langchain.vectorstores.base import VectorStore
+from app.services.vector_math import distance_from_similarity, normalize, similarity_from_distance
+
+class NumpyVectorStore(VectorStore):
+    """Exact brute-force vector store over a memory-mapped .npy matrix of normalized embeddings"""
+
+    INITIAL_CAPACITY = 1024
+    BLOCK_SIZE = 65536
+
+    def __init__(self, directory: str, embedding_function: Optional[Embeddings] = None):
+        self.directory = directory
+        self.embedding_function = embedding_function
+        self._lock = threading.Lock()
+
+        self.dimension: Optional[int] = None
+        self.count = 0
+        self.records: List[dict] = [] # Parallel to the matrix rows: {"id", "text", "metadata"}
+        self.alive: Optional[np.ndarray] = None
+        self.matrix: Optional[np.memmap] = None
+        self._row_by_id = {}
+
+        os.makedirs(self.directory, exist_ok=True)
+        self._load()
+
+    @property
+    def embeddings(self) -> Optional[Embeddings]:
+        return self.embedding_function
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _load(self):
+        state_path = self._path("state.json")
+        if not os.path.exists(state_path):
+            return
+
+        with open(state_path) as f:
+            state = json.load(f)
+        self.dimension = state["dimension"]
+        self.count = state["count"]
+
+        # state.json is the commit point: lines past `count` come from an add that never committed,
+        # and are cut off so the next append lines up with its matrix row again
+        self.records = []
+        with open(self._path("metadata.jsonl"), "r+b") as f:
+            for _ in range(self.count):
+                self.records.append(json.loads(f.readline()))
+            f.truncate(f.tell())
+
+        self.matrix = np.load(self._path("embeddings.npy"), mmap_mode="r+")
+        self.alive = np.zeros(len(self.matrix), dtype=bool)
+        self.alive[:self.count] = True
+        tombstones_path = self._path("tombstones.npy")
+        if os.path.exists(tombstones_path):
+            self.alive[np.load(tombstones_path)] = False
+
+        self._row_by_id = {
+            record["id"]: row for row, record in enumerate(self.records) if self.alive[row]
+        }
+
+    def _save_state(self):
+        self.matrix.flush()
+        np.save(self._path("tombstones.npy"), np.flatnonzero(~self.alive[:self.count]))
+        with open(self._path("state.json"), "w") as f:
+            json.dump({"dimension": self.dimension, "count": self.count}, f)
+
+    def _ensure_capacity(self, rows: int):
+        capacity = len(self.matrix) if self.matrix is not None else 0
+        if self.count + rows <= capacity:
+            return
+
+        new_capacity = max(self.INITIAL_CAPACITY, capacity)
+        while new_capacity < self.count + rows:
+            new_capacity *= 2
+
+        # Grow into a new file and swap it in, so a crash never leaves a half-written matrix behind
+        tmp_path = self._path("embeddings.npy.tmp")
+        grown = np.lib.format.open_memmap(tmp_path, mode="w+", dtype=np.float32, shape=(new_capacity, self.dimension))
+        if self.count:
+            grown[:self.count] = self.matrix[:self.count]
+        grown.flush()
+        del grown
+        # Searches may still hold the old mapping; it stays valid after the replace, so never publish None
+        os.replace(tmp_path, self._path("embeddings.npy"))
+        self.matrix = np.load(self._path("embeddings.npy"), mmap_mode="r+")
+
+        alive = np.zeros(new_capacity, dtype=bool)
+        if self.alive is not None:
+            alive[:len(self.alive)] = self.alive
+        self.alive = alive
+
+    def __len__(self) -> int:
+        return len(self._row_by_id)
+
+    def add_embeddings(
+        self,
+        texts: List[str],
+        embeddings: List[List[float]],
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None
+    ) -> List[str]:
+        """Append pre-computed embeddings; re-adding an existing id tombstones the old row"""
+        if not texts:
+            return []
+
+        ids = ids or [str(uuid.uuid4()) for _ in texts]
+        metadatas = metadatas or [{} for _ in texts]
+        vectors = normalize(np.asarray(embeddings, dtype=np.float32))
+
+        with self._lock:
+            if self.dimension is None:
+                self.dimension = vectors.shape[1]
+            self._ensure_capacity(len(vectors))
+
+            start = self.count
+            self.matrix[start:start + len(vectors)] = vectors
+            with open(self._path("metadata.jsonl"), "a") as f:
+                for offset, (chunk_id, text, chunk_metadata) in enumerate(zip(ids, texts, metadatas)):
+                    if chunk_id in self._row_by_id:
+                        self.alive[self._row_by_id[chunk_id]] = False
+                    record = {"id": chunk_id, "text": text, "metadata": chunk_metadata or {}}
+                    f.write(json.dumps(record) + "\n")
+                    self.records.append(record)
+                    self._row_by_id[chunk_id] = start + offset
+
+            self.alive[start:start + len(vectors)] = True
+            self.count += len(vectors)
+            self._save_state()
+
+        return ids
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any
+    ) -> List[str]:
+        texts = list(texts)
+        embeddings = self.embedding_function.embed_documents(texts)
+        return self.add_embeddings(texts, embeddings, metadatas=metadatas, ids=ids)
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        if not ids:
+            return False
+
+        with self._lock:
+            for chunk_id in ids:
+                row = self._row_by_id.pop(chunk_id, None)
+                if row is not None:
+                    self.alive[row] = False
+            self._save_state()
+        return True
+
+    def get(self, ids: List[str]) -> List[Document]:
+        with self._lock:
+            rows = [self._row_by_id[chunk_id] for chunk_id in ids if chunk_id in self._row_by_id]
+        return [self._to_document(row) for row in rows]
+
+    def _to_document(self, row: int) -> Document:
+        record = self.records[row]
+        return Document(page_content=record["text"], metadata=record["metadata"])
+
+    @classmethod
+    def _matches(cls, metadata: dict, where: dict) -> bool:
+        """Evaluate the subset of Chroma's `where` syntax that RAGService generates"""
+        for key, condition in where.items():
+            if key == "$and":
+                if not all(cls._matches(metadata, clause) for clause in condition):
+                    return False
+                continue
+            if key == "$or":
+                if not any(cls._matches(metadata, clause) for clause in condition):
+                    return False
+                continue
+
+            if not isinstance(condition, dict):
+                condition = {"$eq": condition}
+            value = metadata.get(key)
+            for operator, expected in condition.items():
+                if operator == "$eq" and value != expected:
+                    return False
+                if operator == "$ne" and value == expected:
+                    return False
+                if operator == "$in" and value not in expected:
+                    return False
+                if operator == "$nin" and value in expected:
+                    return False
+                if operator in ("$gt", "$gte", "$lt", "$lte"):
+                    if value is None:
+                        return False
+                    if operator == "$gt" and not value > expected:
+                        return False
+                    if operator == "$gte" and not value >= expected:
+                        return False
+                    if operator == "$lt" and not value < expected:
+                        return False
+                    if operator == "$lte" and not value <= expected:
+                        return False
+        return True
+
+    def _snapshot(self) -> Tuple[Optional[np.memmap], np.ndarray, int]:
+        """Matrix, liveness and row count as of one instant, so appends and growth can't tear a search"""
+        with self._lock:
+            if self.count == 0:
+                return None, np.zeros(0, dtype=bool), 0
+            return self.matrix, self.alive[:self.count].copy(), self.count
+
+    def _candidate_mask(self, alive: np.ndarray, count: int, where: Optional[dict] = None) -> np.ndarray:
+        # Records only ever grow by appending, so the first `count` stay stable without the lock
+        mask = alive
+        if where:
+            mask &= np.fromiter(
+                (self._matches(record["metadata"], where) for record in self.records[:count]),
+                dtype=bool,
+                count=count
+            )
+        return mask
+
+    def _search_matrix(self, queries: np.ndarray, k: int, where: Optional[dict] = None) -> List[List[Tuple[int, float]]]:
+        matrix, alive, count = self._snapshot()
+        if count == 0 or k <= 0:
+            return [[] for _ in queries]
+
+        queries = normalize(queries.astype(np.float32))
+        mask = self._candidate_mask(alive, count, where)
+        k = min(k, int(mask.sum()))
+        if k == 0:
+            return [[] for _ in queries]
+
+        best_rows = np.empty((len(queries), 0), dtype=np.int64)
+        best_scores = np.empty((len(queries), 0), dtype=np.float32)
+
+        # Walk the matrix in blocks so batch queries never materialize a (queries x corpus) score matrix
+        for start in range(0, count, self.BLOCK_SIZE):
+            end = min(start + self.BLOCK_SIZE, count)
+            scores = queries @ matrix[start:end].T
+            scores[:, ~mask[start:end]] = -np.inf
+
+            rows = np.concatenate([best_rows, np.broadcast_to(np.arange(start, end), scores.shape)], axis=1)
+            scores = np.concatenate([best_scores, scores], axis=1)
+            keep = min(k, scores.shape[1])
+            top = np.argpartition(-scores, keep - 1, axis=1)[:, :keep]
+            best_rows = np.take_along_axis(rows, top, axis=1)
+            best_scores = np.take_along_axis(scores, top, axis=1)
+
+        order = np.argsort(-best_scores, axis=1)
+        best_rows = np.take_along_axis(best_rows, order, axis=1)
+        best_scores = np.take_along_axis(best_scores, order, axis=1)
+
+        return [
+            [(int(row), float(distance_from_similarity(score))) for row, score in zip(rows, scores) if np.isfinite(score)]
+            for rows, scores in zip(best_rows, best_scores)
+        ]
+
+    def similarity_search_by_vector_with_relevance_scores(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        filter: Optional[dict] = None,
+        **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        """Return (document, distance) pairs; distance is squared L2 on unit vectors, as in Chroma"""
+        hits = self._search_matrix(np.asarray([embedding]), k, filter)[0]
+        return [(self._to_document(row), distance) for row, distance in hits]
+
+    def similarity_search_batch_by_vector(
+        self,
+        embeddings: List[List[float]],
+        k: int = 4,
+        filter: Optional[dict] = None
+    ) -> List[List[Tuple[Document, float]]]:
+        """Answer many queries with one matrix-matrix product per block"""
+        results = self._search_matrix(np.asarray(embeddings), k, filter)
+        return [[(self._to_document(row), distance) for row, distance in hits] for hits in results]
+
+    def similarity_search_with_score(
+        self,
+        query: str,
+        k: int = 4,
+        filter: Optional[dict] = None,
+        **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        embedding = self.embedding_function.embed_query(query)
+        return self.similarity_search_by_vector_with_relevance_scores(embedding, k=k, filter=filter)
+
+    def similarity_search_by_vector(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        filter: Optional[dict] = None,
+        **kwargs: Any
+    ) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_by_vector_with_relevance_scores(embedding, k=k, filter=filter)]
+
+    def similarity_search(
+        self,
+        query: str,
+        k: int = 4,
+        filter: Optional[dict] = None,
+        **kwargs: Any
+    ) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k=k, filter=filter)]
+
+    def _select_relevance_score_fn(self) -> Callable[[float], float]:
+        return similarity_from_distance
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[dict]] = None,
+        directory: str = "./data/numpy_store",
+        **kwargs: Any
+    ) -> "NumpyVectorStore":
+        store = cls(directory, embedding_function=embedding)
+        store.add_texts(texts, metadatas=metadatas, ids=kwargs.get("ids"))
+        return store
@@ -1,31 +1,86 @@
 import os
-from typing import List, Optional
+import re
+import json
+import uuid
+import asyncio
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
 import chromadb
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain.embeddings import HuggingFaceEmbeddings
 from langchain.vectorstores import Chroma
 from langchain.chains import RetrievalQA
 from langchain.llms import HuggingFacePipeline
+from langchain.schema import Document
+from langchain.vectorstores.base import VectorStore
 from transformers import pipeline, AutoModelForCausalLM, AutoTokenizer
 import torch
 from app.core.config import settings
 from app.core.security import SecurityService
+from app.core.deadline import Deadline, run_within
+from app.services.compact_index import CompactVectorIndex
+from app.services.numpy_vector_store import NumpyVectorStore
+from app.services.sharded_vector_store import ShardedVectorStore
+from app.services.answer_engine import ExtractiveAnswerEngine
+from app.services.embedding_migration import EmbeddingMigration
+from app.services.near_duplicate import NearDuplicateIndex
+from app.services.ingestion import ChunkRecord, MemoryGovernor, iter_windows
+from app.services.index_snapshot import WriteGate
+from app.services.vector_math import similarity_from_distance
 
 class RAGService:
     def __init__(self):
-        self.embeddings = HuggingFaceEmbeddings(
-        model_name=settings.model_name,
-        model_kwargs={"device": "cuda" if torch.cuda.is_available() else "cpu"}
-    )
+        # A finished embedding migration leaves a pointer to the collection and model now serving queries
+        active = self._load_active_collection()
+        self.model_name = active.get("model_name", settings.model_name)
+        self.default_collection_name = active.get("collection", "documents")
 
-        self.chroma_client = chromadb.PersistentClient(
-        path=settings.chroma_persist_directory
-    )
+        self.embeddings = self._create_embeddings(self.model_name)
+
+        self.chroma_client = None
+        if settings.vector_backend == "chroma":
+            self.chroma_client = chromadb.PersistentClient(
+                path=settings.chroma_persist_direcotry
+            )
+        self.shard_clients = self._create_shard_clients()
+        # One pool for every tenant's sharded store; a pool per store would grow threads with tenants x shards
+        self.shard_executor = None
+        if settings.vector_shard_count > 1:
+            self.shard_executor = ThreadPoolExecutor(
+                max_workers=settings.vector_shard_workers or 2 * settings.vector_shard_count,
+                thread_name_prefix="vector-shard"
+            )
 
         self.vector_store = None
+        self.tenant_vector_stores: Dict[str, VectorStore] = {}
         self._initialize_vector_store()
 
+        self.compact_index = None
+        if settings.compact_index_enabled:
+            self.compact_index = CompactVectorIndex(
+                settings.compact_index_directory,
+                mode=settings.compact_index_mode,
+                pq_subvectors=settings.compact_index_pq_subvectors,
+                pq_training_size=settings.compact_index_pq_training_size,
+                rescore_factor=settings.compact_index_rescore_factor
+            )
+        self.compact_index_ready = False # Set once the index holds every chunk in the collection
+
+        self.near_duplicates = None
+        if settings.near_duplicate_detection:
+            self.near_duplicates = NearDuplicateIndex(
+                settings.near_duplicate_index_path,
+                threshold=settings.near_duplicate_threshold
+            )
+
         self.llm = self._initialize_llm()
+        self.answer_engine = ExtractiveAnswerEngine()
+
+        self.write_gate = WriteGate() # Lets a snapshot wait for in-flight uploads and pause new ones
+
+        self.embedding_migration: Optional[EmbeddingMigration] = None
+        self.embedding_migration_store: Optional[Chroma] = None
 
         self.text_splitter = RecursiveCharacterTextSplitter(
             chunk_size=500, #Keeping this small because I have a basic system but you can edit this to increase the chunk size
@@ -33,20 +88,81 @@ class RAGService:
             length_function=len
         )
 
-    def _initialize_vector_store(self):
+    @staticmethod
+    def _create_embeddings(model_name: str) -> HuggingFaceEmbeddings:
+        return HuggingFaceEmbeddings(
+            model_name=model_name,
+            model_kwargs={"device": "cuda" if torch.cuda.is_available() else "cpu"}
+        )
+
+    @staticmethod
+    def _active_collection_path() -> str:
+        return os.path.join(settings.chroma_persist_direcotry, "active_collection.json")
+
+    @staticmethod
+    def _migration_checkpoint_path() -> str:
+        return os.path.join(settings.chroma_persist_direcotry, "embedding_migration.json")
+
+    def _load_active_collection(self) -> dict:
         try:
-            self.vector_store = Chroma(
-                client=self.chroma_client,
-                collection_name="documents",
+            with open(self._active_collection_path()) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+
+    def _create_shard_clients(self) -> list:
+        if settings.vector_backend != "chroma" or settings.vector_shard_count <= 1:
+            return []
+
+        hosts = [host.strip() for host in settings.vector_shard_hosts.split(",") if host.strip()]
+        if not hosts:
+            # In-process shards: separate collections (and HNSW graphs) in the local client
+            return [self.chroma_client] * settings.vector_shard_count
+
+        if len(hosts) != settings.vector_shard_count:
+            raise ValueError(
+                f"vector_shard_hosts lists {len(hosts)} hosts for {settings.vector_shard_count} shards"
+            )
+        return [
+            chromadb.HttpClient(host=host.rsplit(":", 1)[0], port=int(host.rsplit(":", 1)[1]))
+            for host in hosts
+        ]
+
+    @staticmethod
+    def shard_collection_name(collection_name: str, shard: int) -> str:
+        return f"{collection_name}-shard-{shard}"
+
+    def _create_vector_store(self, collection_name: str) -> VectorStore:
+        if settings.vector_shard_count > 1:
+            return ShardedVectorStore(
+                [
+                    self._create_single_store(self.shard_collection_name(collection_name, shard), shard)
+                    for shard in range(settings.vector_shard_count)
+                ],
+                self.embeddings,
+                executor=self.shard_executor
+            )
+        return self._create_single_store(collection_name)
+
+    def _create_single_store(self, collection_name: str, shard: int = 0) -> VectorStore:
+        if settings.vector_backend == "numpy":
+            return NumpyVectorStore(
+                os.path.join(settings.numpy_store_directory, collection_name),
                 embedding_function=self.embeddings
             )
+
+        return Chroma(
+            client=self.shard_clients[shard] if self.shard_clients else self.chroma_client,
+            collection_name=collection_name,
+            embedding_function=self.embeddings
+        )
+
+    def _initialize_vector_store(self):
+        try:
+            self.vector_store = self._create_vector_store(self.default_collection_name)
         except Exception as e:
             print(f"Error initializing vector store: {e}")
-            self.vector_store = Chroma(
-                client=self.chroma_client,
-                collection_name="documents",
-                embedding_function=self.embeddings
-            )        
+            self.vector_store = self._create_vector_store(self.default_collection_name)
 
     def _initialize_llm(self):
         try:
@@ -64,25 +180,236 @@ class RAGService:
         except Exception as e:
             print(f"Error initializing LLM: {e}")
             return None
-        
-    async def add_documents(self, documents: List[str], metadata: List[dict] = None) -> bool:
+
+    def _collection_name(self, tenant: Optional[str] = None) -> str:
+        if not tenant:
+            return self.default_collection_name
+        # Chroma only allows [a-zA-Z0-9._-] in collection names, so hash the subject
+        tenant_hash = hashlib.sha256(tenant.encode()).hexdigest()[:16]
+        return f"documents-{tenant_hash}"
+
+    def _get_vector_store(self, tenant: Optional[str] = None) -> VectorStore:
+        if not tenant:
+            return self.vector_store
+
+        if tenant not in self.tenant_vector_stores:
+            self.tenant_vector_stores[tenant] = self._create_vector_store(self._collection_name(tenant))
+        return self.tenant_vector_stores[tenant]
+
+    def _mirrors_compact_index(self, tenant: Optional[str] = None) -> bool:
+        # The compact index only mirrors the shared, unsharded Chroma collection
+        return (
+            self.compact_index is not None
+            and settings.vector_backend == "chroma"
+            and settings.vector_shard_count <= 1
+            and not tenant
+        )
+
+    def _uses_compact_index(self, tenant: Optional[str] = None, where: Optional[dict] = None) -> bool:
+        # It carries no metadata to filter on, and a partial copy would silently drop older chunks
+        return self._mirrors_compact_index(tenant) and self.compact_index_ready and not where
+
+    def backfill_compact_index(self, batch_size: int = 1000) -> int:
+        """Copy stored embeddings the compact index is missing, e.g. when it is enabled over an existing collection"""
+        if not self._mirrors_compact_index():
+            return 0
+
+        collection = self.vector_store._collection
+        missing = []
+        if len(self.compact_index) < collection.count():
+            missing = [chunk_id for chunk_id in collection.get(include=[])["ids"] if chunk_id not in self.compact_index]
+            for start in range(0, len(missing), batch_size):
+                page = collection.get(ids=missing[start:start + batch_size], include=["embeddings"])
+                self.compact_index.add(page["ids"], page["embeddings"])
+
+        self.compact_index_ready = True
+        return len(missing)
+
+    async def _run_compact_backfill(self):
         try:
-            all_texts = []
-            all_metadata = []
+            backfilled = await asyncio.to_thread(self.backfill_compact_index)
+            print(f"Backfilled {backfilled} chunks into the compact index")
+        except Exception as e:
+            print(f"Error backfilling compact index: {e}")
 
-            for i, doc in enumerate(documents):
-                doc = SecurityService.sanitize_input(doc)
+    def start_compact_backfill(self) -> Optional[asyncio.Task]:
+        """Backfill in the background; queries fall back to Chroma until it completes"""
+        if self.compact_index is None:
+            return None
+        self.compact_backfill_task = asyncio.create_task(self._run_compact_backfill())
+        return self.compact_backfill_task
 
-                chunks = self.text_splitter.split_text(doc)
-                all_texts.extend(chunks)
+    def _write_chunks(self, store: VectorStore, texts: List[str], metadatas: List[dict], ids: List[str], tenant: Optional[str] = None):
+        if not tenant and self.embedding_migration and self.embedding_migration.running:
+            # Dual-write with the same ids so the migration's copy stays complete
+            self.embedding_migration_store.add_texts(texts=texts, metadatas=metadatas, ids=ids)
 
-                doc_metadata = metadata[i] if i < len(metadata) else {}
-                all_metadata.extend([{**doc_metadata, "chunk_id": j} for j in range(len(chunks))])
+        if not self._mirrors_compact_index(tenant):
+            store.add_texts(texts=texts, metadatas=metadatas, ids=ids)
+            return
 
-            self.vector_store.add_texts(
-                texts=all_texts,
-                metadatas=all_metadata
-            )
+        # Embed once and hand the same vectors to both Chroma and the compact index
+        embeddings = self.embeddings.embed_documents(texts)
+        store._collection.upsert(
+            ids=ids,
+            embeddings=embeddings,
+            metadatas=metadatas,
+            documents=texts
+        )
+        self.compact_index.add(ids, embeddings)
+
+    def _compact_search(self, question: str, k: int) -> List[Tuple[Document, float]]:
+        return self._compact_search_by_vector(self.embeddings.embed_query(question), k)
+
+    def _compact_search_by_vector(self, embedding: List[float], k: int) -> List[Tuple[Document, float]]:
+        hits = self.compact_index.search(embedding, k)
+        if not hits:
+            return []
+
+        ids = [chunk_id for chunk_id, _ in hits]
+        records = self.vector_store._collection.get(ids=ids, include=["documents", "metadatas"])
+        by_id = {
+            chunk_id: Document(page_content=text, metadata=chunk_metadata or {})
+            for chunk_id, text, chunk_metadata in zip(records["ids"], records["documents"], records["metadatas"])
+        }
+        return [(by_id[chunk_id], distance) for chunk_id, distance in hits if chunk_id in by_id]
+
+    @staticmethod
+    def _make_snippet(text: str, question: str, width: int = 200) -> str:
+        """Window of `width` characters around the first question term, with terms in bold"""
+        terms = {word for word in re.findall(r"\w+", question.lower()) if len(word) > 2}
+        if not terms:
+            return text[:width]
+
+        pattern = re.compile(r"\b(" + "|".join(re.escape(term) for term in sorted(terms, key=len, reverse=True)) + r")\b", re.IGNORECASE)
+        first_match = pattern.search(text)
+        start = max(0, first_match.start() - width // 3) if first_match else 0
+        window = text[start:start + width]
+
+        snippet = pattern.sub(lambda match: f"**{match.group(0)}**", window)
+        return ("..." if start > 0 else "") + snippet + ("..." if start + width < len(text) else "")
+
+    def _format_source(self, doc: Document, score: float, question: str, response_mode: str = "full") -> dict:
+        references = self.near_duplicates.references_for(doc.metadata.get("vector_id")) if self.near_duplicates else []
+
+        if response_mode != "snippet":
+            source = {"content": doc.page_content, "metadata": doc.metadata, "score": score}
+            if references:
+                source["references"] = references
+            return source
+
+        document_id = doc.metadata.get("document_id")
+        chunk_id = doc.metadata.get("chunk_id")
+        source = {
+            "id": f"{document_id}:{chunk_id}" if document_id is not None else None,
+            "document_id": document_id,
+            "chunk_id": chunk_id,
+            "filename": doc.metadata.get("filename"),
+            "score": score,
+            "snippet": self._make_snippet(doc.page_content, question)
+        }
+        if references:
+            source["references"] = [
+                f"{reference.get('document_id')}:{reference.get('chunk_id')}" for reference in references
+            ]
+        return source
+
+    @staticmethod
+    def _build_where_filter(filters: Optional[dict] = None) -> Optional[dict]:
+        """Translate query filters into a Chroma `where` clause"""
+        if not filters:
+            return None
+
+        conditions = []
+        field_map = {
+            "document_id": "document_id",
+            "document_type": "type",
+            "uploaded_by": "uploaded_by",
+        }
+        for field, key in field_map.items():
+            if filters.get(field) is not None:
+                conditions.append({key: {"$eq": filters[field]}})
+
+        if filters.get("uploaded_after") is not None:
+            conditions.append({"uploaded_at": {"$gte": filters["uploaded_after"].timestamp()}})
+        if filters.get("uploaded_before") is not None:
+            conditions.append({"uploaded_at": {"$lte": filters["uploaded_before"].timestamp()}})
+
+        if not conditions:
+            return None
+        if len(conditions) == 1:
+            return conditions[0]
+        return {"$and": conditions}
+        
+    def iter_document_chunks(self, document: str) -> Iterator[str]:
+        """Chunks in index order, splitting one bounded window of the document at a time"""
+        for window in iter_windows(document.strip(), settings.ingest_split_window_chars):
+            yield from self.text_splitter.split_text(window)
+
+    async def _ingest_batch(self, store: VectorStore, records: List[ChunkRecord], metadata: List[dict], tenant: Optional[str]):
+        texts = [record.text for record in records]
+        ids = [record.vector_id for record in records]
+        metadatas = [
+            {**(metadata[record.document_index] if record.document_index < len(metadata) else {}), "chunk_id": record.chunk_id}
+            for record in records
+        ]
+
+        if self.near_duplicates is not None:
+            # Near-duplicates are not embedded; they become extra source references on the chunk they copy
+            namespace = tenant or ""
+            keep, links, signatures = await asyncio.to_thread(self.near_duplicates.plan, namespace, texts, ids)
+            # A re-indexed chunk matches its own stored copy, which needs neither a vector nor a reference
+            references = [
+                (canonical_id, metadatas[position]) for position, canonical_id in links.items() if canonical_id != ids[position]
+            ]
+            texts = [texts[i] for i in keep]
+            metadatas = [{**metadatas[i], "vector_id": ids[i]} for i in keep]
+            ids = [ids[i] for i in keep]
+
+        # Embedding is CPU-bound; run it off the event loop so other requests keep moving
+        if texts:
+            await asyncio.to_thread(self._write_chunks, store, texts, metadatas, ids, tenant)
+            await asyncio.to_thread(self.answer_engine.index_chunks, texts)
+
+        if self.near_duplicates is not None:
+            self.near_duplicates.commit(namespace, signatures, references)
+
+    @staticmethod
+    def _vector_id(document_id: Optional[str], chunk_id: int, tenant: Optional[str] = None) -> str:
+        # Stable per chunk, so indexing the same document again upserts its vectors instead of duplicating them
+        if document_id is None:
+            return str(uuid.uuid4())
+        return str(uuid.uuid5(uuid.NAMESPACE_URL, f"{tenant or ''}/{document_id}/{chunk_id}"))
+
+    async def add_documents(
+        self,
+        documents: List[str],
+        metadata: List[dict] = None,
+        tenant: Optional[str] = None,
+        on_chunk: Optional[Callable[[int, str], None]] = None
+    ) -> bool:
+        """Index documents; `on_chunk(document_index, text)` sees each chunk in chunk_id order, so callers reuse this split"""
+        try:
+            metadata = metadata or []
+            store = self._get_vector_store(tenant)
+            governor = MemoryGovernor(settings.ingest_memory_ceiling_mb, settings.ingest_batch_size)
+
+            # Only one batch of chunks and embeddings is alive at a time, whatever the document size
+            batch: List[ChunkRecord] = []
+            for i, doc in enumerate(documents):
+                document_id = metadata[i].get("document_id") if i < len(metadata) else None
+                for chunk_id, text in enumerate(self.iter_document_chunks(doc)):
+                    if on_chunk is not None:
+                        on_chunk(i, text)
+                    batch.append(ChunkRecord(text, i, chunk_id, self._vector_id(document_id, chunk_id, tenant)))
+                    if len(batch) >= governor.batch_size:
+                        await self._ingest_batch(store, batch, metadata, tenant)
+                        batch = []
+                        governor.after_batch()
+
+            if batch:
+                await self._ingest_batch(store, batch, metadata, tenant)
+                governor.after_batch()
 
             return True
         
@@ -90,12 +417,46 @@ class RAGService:
             print(f"Error adding documents: {e}")
             return False
 
-    async def query_documents(self, question: str, k: int = 3) -> List[dict]:
+    @staticmethod
+    def _combine_confidence(best_distance: float, answer_confidence: float) -> float:
+        """Blend retrieval similarity of the best chunk with the answer score"""
+        similarity = min(1.0, max(0.0, similarity_from_distance(best_distance)))
+        weight = settings.retrieval_confidence_weight
+        return weight * similarity + (1 - weight) * answer_confidence
+
+    async def query_documents(
+        self,
+        question: str,
+        k: int = 3,
+        filters: Optional[dict] = None,
+        tenant: Optional[str] = None,
+        response_mode: str = "full",
+        degraded: bool = False,
+        deadline: Optional[Deadline] = None
+    ) -> dict:
         try:
             question = SecurityService.sanitize_input(question)
 
-            retriver = self.vector_store.as_retriever(search_kwargs={"k": k})
-            relevant_docs = retriver.get_relevant_documents(question)
+            where = self._build_where_filter(filters)
+
+            try:
+                if self._uses_compact_index(tenant, where):
+                    scored_docs = await run_within(deadline, self._compact_search, question, k)
+                else:
+                    scored_docs = await run_within(
+                        deadline, self._get_vector_store(tenant).similarity_search_with_score, question, k=k, filter=where
+                    )
+            except asyncio.TimeoutError:
+                return {
+                    "answer": "Query deadline exceeded before retrieval finished.",
+                    "sources": [],
+                    "confidence": 0.0,
+                    "degraded": True
+                }
+
+            # Off-topic questions stop here without paying for a QA inference
+            scored_docs = [(doc, score) for doc, score in scored_docs if score <= settings.retrieval_max_distance]
+            relevant_docs = [doc for doc, _ in scored_docs]
 
             if not relevant_docs:
                 return {
@@ -106,21 +467,28 @@ class RAGService:
             
             context = "\n".join([doc.page_content for doc in relevant_docs])
 
-            if self.llm:
-                result = self.llm(question=question, context=context)
-                answer = result['answer']
-                confidence = result.get('score', 0.5)
+            answer = None
+            qa_budget_left = deadline is None or deadline.remaining() * 1000 >= settings.query_min_qa_budget_ms
+            if self.llm and not degraded and qa_budget_left:
+                try:
+                    result = await run_within(deadline, self.llm, question=question, context=context)
+                    answer = result['answer']
+                    confidence = result.get('score', 0.5)
+                except asyncio.TimeoutError:
+                    pass
 
-            else:
-                # Fallback to extractive QA if LLM is not available
-                answer = self._extractive_answer(question, context)
-                confidence = 0.5
+            if answer is None:
+                # Fallback to extractive QA if LLM is not available, or the caller cannot wait for it
+                answer, confidence = self.answer_engine.answer(question, [doc.page_content for doc in relevant_docs])
+                answer = answer or "No answer found in the context."
+                degraded = True
 
             return {
                 "answer": answer,
-                "sources": [{"content": doc.page_content, "metadata": doc.metadata} 
-                            for doc in relevant_docs],
-                "confidence": confidence
+                "sources": [self._format_source(doc, score, question, response_mode)
+                            for doc, score in scored_docs],
+                "confidence": self._combine_confidence(scored_docs[0][1], confidence),
+                "degraded": degraded
             }
 
         except Exception as e:
@@ -131,36 +499,212 @@ class RAGService:
                 "confidence": 0.0
             }
     
-    def _extractive_answer(self, question: str, context: str) -> str:
-        question_words = question.lower().split()
-        context_sentences = context.split('. ')
+    def _search_batch(self, embeddings: List[List[float]], k: int, where: Optional[dict], tenant: Optional[str]) -> List[List[Tuple[Document, float]]]:
+        """Top k for many query vectors with one call to the store"""
+        if self._uses_compact_index(tenant, where):
+            return [self._compact_search_by_vector(embedding, k) for embedding in embeddings]
+
+        store = self._get_vector_store(tenant)
+        if hasattr(store, "similarity_search_batch_by_vector"):
+            return store.similarity_search_batch_by_vector(embeddings, k=k, filter=where)
 
-        best_sentence = ""
-        max_matches = 0
+        # Chroma answers every query embedding in a single request
+        results = store._collection.query(
+            query_embeddings=embeddings,
+            n_results=k,
+            where=where,
+            include=["documents", "metadatas", "distances"]
+        )
+        return [
+            [(Document(page_content=text, metadata=metadata or {}), distance)
+             for text, metadata, distance in zip(texts, metadatas, distances)]
+            for texts, metadatas, distances in zip(results["documents"], results["metadatas"], results["distances"])
+        ]
 
-        for sentence in context_sentences:
-            sentence_words = sentence.lower().split()
-            matches = sum(1 for word in question_words if word in sentence_words)
+    def _answer_batch(self, questions: List[str], contexts: List[List[str]]) -> List[Tuple[str, float, bool]]:
+        """(answer, confidence, degraded) per question, running the QA model over the whole batch at once"""
+        if self.llm:
+            # The pipeline pads the batch to its longest (question, context) pair and runs one forward pass
+            results = self.llm(
+                [{"question": question, "context": "\n".join(texts)} for question, texts in zip(questions, contexts)],
+                batch_size=len(questions)
+            )
+            if isinstance(results, dict):
+                results = [results]
+            return [(result["answer"], result.get("score", 0.5), False) for result in results]
 
-            if matches > max_matches:
-                max_matches = matches
-                best_sentence = sentence.strip()
+        answers = []
+        for question, texts in zip(questions, contexts):
+            answer, confidence = self.answer_engine.answer(question, texts)
+            answers.append((answer or "No answer found in the context.", confidence, True))
+        return answers
 
-        return best_sentence if best_sentence else "No answer found in the context."
-    
+    async def query_batch(self, queries: List[dict], tenant: Optional[str] = None) -> AsyncIterator[dict]:
+        """Answer many questions with one embedding call, one store query per filter and batched QA.
 
-    async def get_document_stats(self) -> dict:
+        Results are yielded as they are ready, so they are not in request order; each carries its `index`.
+        """
+        answered = set()
         try:
-            collection = self.chroma_client.get_collection("documents")
-            count = collection.count()
+            questions = [SecurityService.sanitize_input(query["question"]) for query in queries]
+            embeddings = await asyncio.to_thread(self.embeddings.embed_documents, questions)
 
-            return {
+            wheres = [self._build_where_filter(query.get("filters")) for query in queries]
+            groups: Dict[str, List[int]] = {}
+            for i, where in enumerate(wheres):
+                groups.setdefault(json.dumps(where, sort_keys=True, default=str), []).append(i)
+
+            scored_docs: List[List[Tuple[Document, float]]] = [[] for _ in queries]
+            for positions in groups.values():
+                k = max(queries[i].get("max_results", 3) for i in positions)
+                hits = await asyncio.to_thread(
+                    self._search_batch, [embeddings[i] for i in positions], k, wheres[positions[0]], tenant
+                )
+                for i, query_hits in zip(positions, hits):
+                    scored_docs[i] = [
+                        (doc, score) for doc, score in query_hits[:queries[i].get("max_results", 3)]
+                        if score <= settings.retrieval_max_distance
+                    ]
+
+            pending = []
+            for i, query in enumerate(queries):
+                if scored_docs[i]:
+                    pending.append(i)
+                    continue
+                answered.add(i)
+                yield {
+                    "index": i,
+                    "question": query["question"],
+                    "answer": "No relevant documents found.",
+                    "sources": [],
+                    "confidence": 0.0,
+                    "degraded": False
+                }
+
+            for start in range(0, len(pending), settings.qa_batch_size):
+                batch = pending[start:start + settings.qa_batch_size]
+                answers = await asyncio.to_thread(
+                    self._answer_batch,
+                    [questions[i] for i in batch],
+                    [[doc.page_content for doc, _ in scored_docs[i]] for i in batch]
+                )
+                for i, (answer, confidence, degraded) in zip(batch, answers):
+                    response_mode = queries[i].get("response_mode", "full")
+                    answered.add(i)
+                    yield {
+                        "index": i,
+                        "question": queries[i]["question"],
+                        "answer": answer,
+                        "sources": [self._format_source(doc, score, questions[i], response_mode) for doc, score in scored_docs[i]],
+                        "confidence": self._combine_confidence(scored_docs[i][0][1], confidence),
+                        "degraded": degraded
+                    }
+
+        except Exception as e:
+            print(f"Error answering query batch: {e}")
+            # One line per unanswered question, so a client matching on `index` can tell which ones failed
+            for i, query in enumerate(queries):
+                if i not in answered:
+                    yield {"index": i, "question": query.get("question"), "error": "Error processing query."}
+
+    async def start_embedding_migration(
+        self,
+        model_name: str,
+        rate_limit_per_second: Optional[float] = None,
+        batch_size: Optional[int] = None
+    ) -> dict:
+        if (
+            settings.vector_backend != "chroma"
+            or settings.vector_shard_count > 1
+            or settings.tenant_isolation
+            or self.compact_index is not None
+        ):
+            raise ValueError(
+                "Embedding migration only supports the shared, unsharded Chroma collection without a compact index"
+            )
+        if self.embedding_migration and self.embedding_migration.running:
+            raise ValueError("An embedding migration is already running")
+        if model_name == self.model_name:
+            raise ValueError(f"Collection is already embedded with {model_name}")
+
+        model_hash = hashlib.sha256(model_name.encode()).hexdigest()[:12]
+        target_collection = f"documents-{model_hash}"
+        embeddings = await asyncio.to_thread(self._create_embeddings, model_name)
+
+        self.embedding_migration_store = Chroma(
+            client=self.chroma_client,
+            collection_name=target_collection,
+            embedding_function=embeddings
+        )
+        self.embedding_migration = EmbeddingMigration(
+            self.chroma_client,
+            self.default_collection_name,
+            target_collection,
+            model_name,
+            embeddings,
+            self._migration_checkpoint_path(),
+            rate_limit_per_second=rate_limit_per_second or settings.embedding_migration_rate_limit,
+            batch_size=batch_size or settings.embedding_migration_batch_size
+        )
+        self.embedding_migration.start(self._switch_to_migrated_collection, self.write_gate)
+        return self.embedding_migration.get_status()
+
+    async def resume_embedding_migration(self):
+        """Pick up a migration that was interrupted by a restart"""
+        checkpoint = EmbeddingMigration.read_checkpoint(self._migration_checkpoint_path())
+        if checkpoint and checkpoint.get("status") == "running" and checkpoint.get("model_name") != self.model_name:
+            await self.start_embedding_migration(
+                checkpoint["model_name"],
+                rate_limit_per_second=checkpoint.get("rate_limit_per_second"),
+                batch_size=checkpoint.get("batch_size")
+            )
+
+    def embedding_migration_status(self) -> dict:
+        if self.embedding_migration is None:
+            return {"status": "idle", "model_name": self.model_name, "collection": self.default_collection_name}
+        return self.embedding_migration.get_status()
+
+    async def _switch_to_migrated_collection(self, migration: EmbeddingMigration):
+        # Persist the pointer first so a restart comes back on the new collection too
+        tmp_path = f"{self._active_collection_path()}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"collection": migration.target_collection, "model_name": migration.model_name}, f)
+        os.replace(tmp_path, self._active_collection_path())
+
+        # Rebinding the attributes is atomic for queries: each one reads vector_store once
+        self.embeddings = migration.embeddings
+        self.model_name = migration.model_name
+        self.default_collection_name = migration.target_collection
+        self.vector_store = self.embedding_migration_store
+
+    def probe_vector_store(self) -> dict:
+        if settings.vector_backend == "numpy" or settings.vector_shard_count > 1:
+            return {"chunks": len(self.vector_store)}
+        return {"chunks": self.vector_store._collection.count()}
+
+    def probe_models(self) -> dict:
+        self.embeddings.embed_query("health check")
+        return {"embedding_model": self.model_name, "qa_model_loaded": self.llm is not None}
+
+    async def get_document_stats(self, tenant: Optional[str] = None) -> dict:
+        collection_name = self._collection_name(tenant)
+        try:
+            if settings.vector_backend == "numpy" or settings.vector_shard_count > 1:
+                count = len(self._get_vector_store(tenant))
+            else:
+                collection = self.chroma_client.get_collection(collection_name)
+                count = collection.count()
+
+            stats = {
                 "total_documents": count,
-                "collection_name": "documents",
+                "collection_name": collection_name,
             }
+            if self.near_duplicates is not None:
+                stats["near_duplicates"] = self.near_duplicates.report()
+            return stats
         except Exception as e:
             print(f"Error getting document stats: {e}")
             return {
                 "total_documents": 0,
-                "collection_name": "documents",
+                "collection_name": collection_name,
             }
\ No newline at end of file
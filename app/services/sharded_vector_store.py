@@ -0,0 +1,156 @@
+import heapq
+import uuid
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from langchain.schema import Document
+from langchain.schema.embeddings import Embeddings
+from langchain.vectorstores.base import VectorStore
+
+class ShardedVectorStore(VectorStore):
+    """Scatter-gather over N shard stores, with chunks placed by hashing their document ID"""
+
+    def __init__(self, shards: List[VectorStore], embedding_function: Embeddings, executor: Optional[ThreadPoolExecutor] = None):
+        """`executor` is shared by every store in a process, so threads do not grow with the number of stores"""
+        if not shards:
+            raise ValueError("ShardedVectorStore needs at least one shard")
+
+        self.shards = shards
+        self.embedding_function = embedding_function
+        self.executor = executor or ThreadPoolExecutor(
+            max_workers=len(shards),
+            thread_name_prefix="vector-shard"
+        )
+
+    @property
+    def embeddings(self) -> Optional[Embeddings]:
+        return self.embedding_function
+
+    @staticmethod
+    def shard_for(document_id: str, shard_count: int) -> int:
+        # Stable across processes, unlike hash(), so an offline rebalance can recompute placements
+        return int(hashlib.md5(document_id.encode()).hexdigest(), 16) % shard_count
+
+    def _route(self, chunk_id: str, metadata: dict) -> int:
+        return self.shard_for(str(metadata.get("document_id") or chunk_id), len(self.shards))
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any
+    ) -> List[str]:
+        texts = list(texts)
+        metadatas = metadatas or [{} for _ in texts]
+        ids = ids or [str(uuid.uuid4()) for _ in texts]
+
+        groups: Dict[int, Tuple[List[str], List[dict], List[str]]] = {}
+        for text, metadata, chunk_id in zip(texts, metadatas, ids):
+            group = groups.setdefault(self._route(chunk_id, metadata), ([], [], []))
+            group[0].append(text)
+            group[1].append(metadata)
+            group[2].append(chunk_id)
+
+        # Each shard embeds and writes its own group, so ingest runs on all shards at once
+        futures = [
+            self.executor.submit(self.shards[shard].add_texts, group_texts, metadatas=group_metadatas, ids=group_ids)
+            for shard, (group_texts, group_metadatas, group_ids) in groups.items()
+        ]
+        for future in futures:
+            future.result()
+
+        return ids
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        # Chunk IDs carry no placement, so ask every shard
+        futures = [self.executor.submit(shard.delete, ids) for shard in self.shards]
+        for future in futures:
+            future.result()
+        return True
+
+    def similarity_search_by_vector_with_relevance_scores(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        filter: Optional[dict] = None,
+        **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        """Top k across all shards by distance (lower is closer)"""
+        futures = [
+            self.executor.submit(shard.similarity_search_by_vector_with_relevance_scores, embedding, k=k, filter=filter)
+            for shard in self.shards
+        ]
+        hits = [hit for future in futures for hit in future.result()]
+        return heapq.nsmallest(k, hits, key=lambda hit: hit[1])
+
+    def similarity_search_batch_by_vector(
+        self,
+        embeddings: List[List[float]],
+        k: int = 4,
+        filter: Optional[dict] = None
+    ) -> List[List[Tuple[Document, float]]]:
+        futures = [
+            self.executor.submit(self._search_shard_batch, shard, embeddings, k, filter)
+            for shard in self.shards
+        ]
+        per_shard = [future.result() for future in futures]
+        return [
+            heapq.nsmallest(k, (hit for shard_hits in per_shard for hit in shard_hits[i]), key=lambda hit: hit[1])
+            for i in range(len(embeddings))
+        ]
+
+    @staticmethod
+    def _search_shard_batch(shard: VectorStore, embeddings: List[List[float]], k: int, filter: Optional[dict]) -> List[List[Tuple[Document, float]]]:
+        if hasattr(shard, "similarity_search_batch_by_vector"):
+            return shard.similarity_search_batch_by_vector(embeddings, k=k, filter=filter)
+        return [shard.similarity_search_by_vector_with_relevance_scores(embedding, k=k, filter=filter) for embedding in embeddings]
+
+    def similarity_search_with_score(
+        self,
+        query: str,
+        k: int = 4,
+        filter: Optional[dict] = None,
+        **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        embedding = self.embedding_function.embed_query(query)
+        return self.similarity_search_by_vector_with_relevance_scores(embedding, k=k, filter=filter)
+
+    def similarity_search_by_vector(
+        self,
+        embedding: List[float],
+        k: int = 4,
+        filter: Optional[dict] = None,
+        **kwargs: Any
+    ) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_by_vector_with_relevance_scores(embedding, k=k, filter=filter)]
+
+    def similarity_search(
+        self,
+        query: str,
+        k: int = 4,
+        filter: Optional[dict] = None,
+        **kwargs: Any
+    ) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k=k, filter=filter)]
+
+    def _select_relevance_score_fn(self):
+        return self.shards[0]._select_relevance_score_fn()
+
+    def __len__(self) -> int:
+        return sum(
+            len(shard) if hasattr(shard, "__len__") else shard._collection.count()
+            for shard in self.shards
+        )
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[dict]] = None,
+        **kwargs: Any
+    ) -> "ShardedVectorStore":
+        store = cls(kwargs.pop("shards"), embedding)
+        store.add_texts(texts, metadatas=metadatas, ids=kwargs.get("ids"))
+        return store
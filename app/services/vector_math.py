@@ -0,0 +1,18 @@
+import numpy as np
+
+# Every store reports squared L2 between unit vectors, like Chroma's default space.
+# For unit vectors that distance is 2 - 2cos, so it converts to and from cosine similarity exactly.
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """Scale rows to unit length; zero rows are left as they are"""
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+def distance_from_similarity(similarity):
+    """Squared L2 distance between unit vectors with this cosine similarity"""
+    return 2.0 - 2.0 * similarity
+
+def similarity_from_distance(distance):
+    """Cosine similarity of unit vectors this squared L2 distance apart"""
+    return 1.0 - distance / 2.0
@@ -0,0 +1,128 @@
+"""Memory per million chunks and recall@k of the compact index against the Chroma store.
+
+Run from the repository root:
+    python -m benchmarks.compact_index_benchmark --chunks 100000 --chroma
+"""
+import os
+import time
+import uuid
+import argparse
+import tempfile
+import numpy as np
+from app.services.compact_index import CompactVectorIndex
+
+def synthetic_embeddings(count: int, dimension: int, clusters: int, rng: np.random.Generator) -> np.ndarray:
+    # Clustered unit vectors look more like sentence embeddings than uniform noise does
+    centers = rng.standard_normal((clusters, dimension)).astype(np.float32)
+    vectors = centers[rng.integers(0, clusters, size=count)] + 0.35 * rng.standard_normal((count, dimension)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+def exact_top_k(corpus: np.ndarray, queries: np.ndarray, k: int) -> np.ndarray:
+    similarities = queries @ corpus.T
+    top = np.argpartition(-similarities, k - 1, axis=1)[:, :k]
+    return top
+
+def recall_at_k(expected: np.ndarray, found: list) -> float:
+    hits = sum(len(set(expected_row) & set(found_row)) for expected_row, found_row in zip(expected, found))
+    return hits / expected.size
+
+def directory_size(path: str) -> int:
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, names in os.walk(path)
+        for name in names
+    )
+
+def bench_compact(mode: str, corpus: np.ndarray, queries: np.ndarray, expected: np.ndarray, args) -> dict:
+    with tempfile.TemporaryDirectory() as directory:
+        index = CompactVectorIndex(
+            directory,
+            mode=mode,
+            pq_subvectors=args.pq_subvectors,
+            pq_training_size=min(args.pq_training_size, len(corpus)),
+            rescore_factor=args.rescore_factor
+        )
+        ids = [str(i) for i in range(len(corpus))]
+        for start in range(0, len(corpus), args.batch_size):
+            index.add(ids[start:start + args.batch_size], corpus[start:start + args.batch_size])
+        index.wait_for_training()
+
+        started = time.perf_counter()
+        found = [[int(chunk_id) for chunk_id, _ in index.search(query, args.k)] for query in queries]
+        elapsed = time.perf_counter() - started
+
+        return {
+            "name": f"compact/{mode}",
+            "bytes_per_chunk": index.memory_bytes() / len(corpus),
+            "recall": recall_at_k(expected, found),
+            "ms_per_query": 1000 * elapsed / len(queries),
+        }
+
+def bench_chroma(corpus: np.ndarray, queries: np.ndarray, expected: np.ndarray, args) -> dict:
+    import chromadb
+
+    with tempfile.TemporaryDirectory() as directory:
+        client = chromadb.PersistentClient(path=directory)
+        collection = client.create_collection(f"bench-{uuid.uuid4().hex[:8]}")
+        for start in range(0, len(corpus), args.batch_size):
+            batch = corpus[start:start + args.batch_size]
+            collection.add(
+                ids=[str(i) for i in range(start, start + len(batch))],
+                embeddings=batch.tolist()
+            )
+
+        started = time.perf_counter()
+        result = collection.query(query_embeddings=queries.tolist(), n_results=args.k, include=[])
+        elapsed = time.perf_counter() - started
+
+        return {
+            "name": "chroma/float32-hnsw",
+            "bytes_per_chunk": directory_size(directory) / len(corpus),
+            "recall": recall_at_k(expected, [[int(i) for i in row] for row in result["ids"]]),
+            "ms_per_query": 1000 * elapsed / len(queries),
+        }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=50000)
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--clusters", type=int, default=500)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--pq-subvectors", type=int, default=48)
+    parser.add_argument("--pq-training-size", type=int, default=10000)
+    parser.add_argument("--rescore-factor", type=int, default=4)
+    parser.add_argument("--chroma", action="store_true", help="also build a Chroma collection for comparison")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    corpus = synthetic_embeddings(args.chunks, args.dimension, args.clusters, rng)
+    queries = synthetic_embeddings(args.queries, args.dimension, args.clusters, rng)
+    expected = exact_top_k(corpus, queries, args.k)
+
+    results = [
+        {
+            "name": "exact/float32",
+            "bytes_per_chunk": corpus.nbytes / len(corpus),
+            "recall": 1.0,
+            "ms_per_query": float("nan"),
+        },
+        bench_compact("float16", corpus, queries, expected, args),
+        bench_compact("pq", corpus, queries, expected, args),
+    ]
+    if args.chroma:
+        results.append(bench_chroma(corpus, queries, expected, args))
+
+    print(f"{args.chunks} chunks, {args.dimension} dims, recall@{args.k} over {args.queries} queries")
+    print(f"{'index':<22}{'MB / 1M chunks':>16}{'recall@k':>10}{'ms/query':>10}")
+    for result in results:
+        print(
+            f"{result['name']:<22}"
+            f"{result['bytes_per_chunk'] * 1_000_000 / 2**20:>16.1f}"
+            f"{result['recall']:>10.3f}"
+            f"{result['ms_per_query']:>10.2f}"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+"""Ingest and query latency of the memory-mapped NumPy store against Chroma.
+
+Run from the repository root:
+    python -m benchmarks.numpy_store_benchmark --chunks 200000 --batch-queries 64
+"""
+import time
+import uuid
+import argparse
+import tempfile
+import numpy as np
+from app.services.numpy_vector_store import NumpyVectorStore
+from benchmarks.compact_index_benchmark import synthetic_embeddings, exact_top_k, recall_at_k
+
+def percentile_ms(samples: list, q: float) -> float:
+    return 1000 * float(np.percentile(samples, q))
+
+def bench_numpy(corpus: np.ndarray, queries: np.ndarray, expected: np.ndarray, args) -> dict:
+    with tempfile.TemporaryDirectory() as directory:
+        store = NumpyVectorStore(directory)
+        texts = [f"chunk {i}" for i in range(len(corpus))]
+
+        started = time.perf_counter()
+        for start in range(0, len(corpus), args.batch_size):
+            end = start + args.batch_size
+            store.add_embeddings(
+                texts[start:end],
+                corpus[start:end],
+                metadatas=[{"chunk_id": i} for i in range(start, min(end, len(corpus)))],
+                ids=[str(i) for i in range(start, min(end, len(corpus)))]
+            )
+        ingest_seconds = time.perf_counter() - started
+
+        latencies, found = [], []
+        for query in queries:
+            started = time.perf_counter()
+            hits = store.similarity_search_by_vector_with_relevance_scores(query, k=args.k)
+            latencies.append(time.perf_counter() - started)
+            found.append([doc.metadata["chunk_id"] for doc, _ in hits])
+
+        started = time.perf_counter()
+        for start in range(0, len(queries), args.batch_queries):
+            store.similarity_search_batch_by_vector(queries[start:start + args.batch_queries], k=args.k)
+        batch_seconds = time.perf_counter() - started
+
+        return {
+            "name": "numpy/mmap",
+            "ingest_per_s": len(corpus) / ingest_seconds,
+            "p50_ms": percentile_ms(latencies, 50),
+            "p95_ms": percentile_ms(latencies, 95),
+            "batch_qps": len(queries) / batch_seconds,
+            "recall": recall_at_k(expected, found),
+        }
+
+def bench_chroma(corpus: np.ndarray, queries: np.ndarray, expected: np.ndarray, args) -> dict:
+    import chromadb
+
+    with tempfile.TemporaryDirectory() as directory:
+        client = chromadb.PersistentClient(path=directory)
+        collection = client.create_collection(f"bench-{uuid.uuid4().hex[:8]}")
+
+        started = time.perf_counter()
+        for start in range(0, len(corpus), args.batch_size):
+            batch = corpus[start:start + args.batch_size]
+            collection.add(
+                ids=[str(i) for i in range(start, start + len(batch))],
+                embeddings=batch.tolist(),
+                documents=[f"chunk {i}" for i in range(start, start + len(batch))]
+            )
+        ingest_seconds = time.perf_counter() - started
+
+        latencies, found = [], []
+        for query in queries:
+            started = time.perf_counter()
+            result = collection.query(query_embeddings=[query.tolist()], n_results=args.k)
+            latencies.append(time.perf_counter() - started)
+            found.append([int(i) for i in result["ids"][0]])
+
+        started = time.perf_counter()
+        for start in range(0, len(queries), args.batch_queries):
+            collection.query(query_embeddings=queries[start:start + args.batch_queries].tolist(), n_results=args.k)
+        batch_seconds = time.perf_counter() - started
+
+        return {
+            "name": "chroma/hnsw",
+            "ingest_per_s": len(corpus) / ingest_seconds,
+            "p50_ms": percentile_ms(latencies, 50),
+            "p95_ms": percentile_ms(latencies, 95),
+            "batch_qps": len(queries) / batch_seconds,
+            "recall": recall_at_k(expected, found),
+        }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--chunks", type=int, default=100000)
+    parser.add_argument("--dimension", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=256)
+    parser.add_argument("--batch-queries", type=int, default=32)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--clusters", type=int, default=500)
+    parser.add_argument("--batch-size", type=int, default=5000)
+    parser.add_argument("--skip-chroma", action="store_true")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(42)
+    corpus = synthetic_embeddings(args.chunks, args.dimension, args.clusters, rng)
+    queries = synthetic_embeddings(args.queries, args.dimension, args.clusters, rng)
+    expected = exact_top_k(corpus, queries, args.k)
+
+    results = [bench_numpy(corpus, queries, expected, args)]
+    if not args.skip_chroma:
+        results.append(bench_chroma(corpus, queries, expected, args))
+
+    print(f"{args.chunks} chunks, {args.dimension} dims, k={args.k}, batches of {args.batch_queries} queries")
+    print(f"{'backend':<14}{'ingest/s':>12}{'p50 ms':>10}{'p95 ms':>10}{'batch q/s':>12}{'recall@k':>10}")
+    for result in results:
+        print(
+            f"{result['name']:<14}"
+            f"{result['ingest_per_s']:>12.0f}"
+            f"{result['p50_ms']:>10.2f}"
+            f"{result['p95_ms']:>10.2f}"
+            f"{result['batch_qps']:>12.0f}"
+            f"{result['recall']:>10.3f}"
+        )
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,55 @@
 import streamlit as st
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import json
 import time 
 from typing import Optional 
 
 API_BASE_URL = "http://localhost:8000" # Update with your API base URL
+REQUEST_TIMEOUT = 30
+DOCUMENTS_CACHE_TTL = 30 # Seconds, cleared early on upload
+HEALTH_CACHE_TTL = 10
+
+@st.cache_resource
+def get_http_session() -> requests.Session:
+    """One pooled, keep-alive session shared by every rerun and browser tab"""
+    session = requests.Session()
+    adapter = HTTPAdapter(
+        pool_connections=4,
+        pool_maxsize=16,
+        max_retries=Retry(total=2, backoff_factor=0.2, allowed_methods=["GET"])
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+@st.cache_data(ttl=DOCUMENTS_CACHE_TTL, show_spinner=False)
+def fetch_documents(token: str) -> list:
+    response = get_http_session().get(
+        f"{API_BASE_URL}/documents",
+        headers={"Authorization": f"Bearer {token}"},
+        timeout=REQUEST_TIMEOUT
+    )
+    response.raise_for_status() # Raising keeps failed fetches out of the cache
+    return response.json().get("documents", [])
+
+@st.cache_data(ttl=HEALTH_CACHE_TTL, show_spinner=False)
+def fetch_health() -> dict:
+    response = get_http_session().get(f"{API_BASE_URL}/health", timeout=REQUEST_TIMEOUT)
+    response.raise_for_status()
+    return response.json()
 
 class RAGSystemUI:
     def __init__(self):
         self.token = None
+        self.session = get_http_session()
         if 'token' in st.session_state:
             self.token = st.session_state.token
 
     def authenticate(self, username: str, password: str) -> bool:
         try: 
-            response = requests.post(
+            response = self.session.post(
                 f"{API_BASE_URL}/auth/token",
                 params={"username": username, "password": password}
             )
@@ -40,13 +75,15 @@ class RAGSystemUI:
             files = {"file": (file.name, file, file.type)}
 
             with st.spinner("Uploading and processing document..."):
-                response = requests.post(
+                response = self.session.post(
                     f"{API_BASE_URL}/documents/upload",
                     headers=headers,
-                    files=files
+                    files=files,
+                    timeout=REQUEST_TIMEOUT
                 )
 
             if response.status_code == 200:
+                fetch_documents.clear()
                 st.success("Document uploaded and processed successfully.")
                 return True
             else:
@@ -74,10 +111,11 @@ class RAGSystemUI:
             }
 
             with st.spinner("Querying documents..."):
-                response = requests.post(
+                response = self.session.post(
                     f"{API_BASE_URL}/query",
                     headers=headers,
-                    json=data
+                    json=data,
+                    timeout=REQUEST_TIMEOUT
                 )
 
             if response.status_code == 200:
@@ -95,16 +133,11 @@ class RAGSystemUI:
             return None
         
         try: 
-            headers = {"Autorization": f"Bearer {self.token}"}
-            response = requests.get(
-                f"{API_BASE_URL}/documents",
-                headers=headers
-            )
+            return fetch_documents(self.token)
 
-            if response.status_code == 200:
-                return response.json().get("documents", [])
+        except requests.HTTPError:
             return []
-        
+
         except Exception as e:
             st.error(f"Error retrieving documents list: {e}")
             return []
@@ -221,9 +254,8 @@ def main():
                 st.sidebar.subheader("System Status")
 
                 try:
-                    response = requests.get(f"{API_BASE_URL}/health")
-                    if response.status_code == 200:
-                        health = response.json()
+                    health = fetch_health()
+                    if health:
                         st.sidebar.success("System is running smoothly!")
 
                         aws_status = health.get("services", {}).get("aws", {})
@@ -234,6 +266,8 @@ def main():
                         st.sidebar.text(f"Lambda Status: {lambda_status}")
                     else:
                         st.sidebar.error("System health check failed.")
+                except requests.HTTPError:
+                    st.sidebar.error("System health check failed.")
                 except:
                     st.sidebar.error("API Unreachable")
 
@@ -0,0 +1,91 @@
+"""Offline rebalance of Chroma shard collections after changing vector_shard_count.
+
+Stop the API first. Every chunk is re-placed by hashing its document ID, exactly as
+ShardedVectorStore routes new writes, and chunks that land on another shard are moved
+with their stored embeddings (nothing is re-embedded).
+
+Shards can run as separate local processes, one `chroma run` per shard:
+    chroma run --path ./data/shard-0 --port 8100
+    chroma run --path ./data/shard-1 --port 8101
+then set VECTOR_SHARD_HOSTS=localhost:8100,localhost:8101 for the API.
+
+Run from the repository root:
+    python -m scripts.rebalance_shards --from-count 2 --to-count 4 --hosts localhost:8100,localhost:8101,localhost:8102,localhost:8103
+"""
+import argparse
+import chromadb
+from app.core.config import settings
+from app.services.sharded_vector_store import ShardedVectorStore
+
+def collection_name(base: str, shard: int, shard_count: int) -> str:
+    # An unsharded deployment keeps everything in the base collection
+    return base if shard_count <= 1 else f"{base}-shard-{shard}"
+
+def client_for(shard: int, hosts: list, local_client):
+    if not hosts:
+        return local_client
+    host, port = hosts[shard].rsplit(":", 1)
+    return chromadb.HttpClient(host=host, port=int(port))
+
+def rebalance(base: str, from_count: int, to_count: int, hosts: list, batch_size: int):
+    local_client = None if hosts else chromadb.PersistentClient(path=settings.chroma_persist_direcotry)
+    targets = {
+        shard: client_for(shard, hosts, local_client).get_or_create_collection(collection_name(base, shard, to_count))
+        for shard in range(to_count)
+    }
+
+    moved = 0
+    for source_shard in range(from_count):
+        source = client_for(source_shard, hosts, local_client).get_or_create_collection(
+            collection_name(base, source_shard, from_count)
+        )
+        moved_ids = []
+        offset = 0
+        while True:
+            page = source.get(include=["embeddings", "documents", "metadatas"], limit=batch_size, offset=offset)
+            if not page["ids"]:
+                break
+            offset += len(page["ids"])
+
+            by_target = {}
+            for chunk_id, embedding, document, metadata in zip(page["ids"], page["embeddings"], page["documents"], page["metadatas"]):
+                target_shard = ShardedVectorStore.shard_for(str((metadata or {}).get("document_id") or chunk_id), to_count)
+                if targets[target_shard].name == source.name and target_shard == source_shard:
+                    continue
+                batch = by_target.setdefault(target_shard, {"ids": [], "embeddings": [], "documents": [], "metadatas": []})
+                batch["ids"].append(chunk_id)
+                batch["embeddings"].append(embedding)
+                batch["documents"].append(document)
+                batch["metadatas"].append(metadata)
+
+            for target_shard, batch in by_target.items():
+                targets[target_shard].upsert(**batch)
+                moved_ids.extend(batch["ids"])
+
+        # Delete only after the scan so paging offsets stay valid
+        for start in range(0, len(moved_ids), batch_size):
+            source.delete(ids=moved_ids[start:start + batch_size])
+        moved += len(moved_ids)
+        print(f"Shard {source_shard}: moved {len(moved_ids)} chunks")
+
+    for shard, target in targets.items():
+        print(f"Shard {shard} ({target.name}): {target.count()} chunks")
+    print(f"Moved {moved} chunks in total")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--collection", default="documents")
+    parser.add_argument("--from-count", type=int, required=True)
+    parser.add_argument("--to-count", type=int, required=True)
+    parser.add_argument("--hosts", default="", help="host:port per shard index, covering max(from, to) shards")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    hosts = [host.strip() for host in args.hosts.split(",") if host.strip()]
+    if hosts and len(hosts) < max(args.from_count, args.to_count):
+        parser.error("--hosts must list one host for every shard index")
+
+    rebalance(args.collection, args.from_count, args.to_count, hosts, args.batch_size)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+import time
+import asyncio
+import pytest
+from app.core.admission import AdmissionController, AdmissionRejected
+from app.core.deadline import Deadline, run_within
+
+def test_queue_prefers_queries_and_sheds_when_full():
+    """Test that queued queries run before uploads and a full queue returns 503 with Retry-After"""
+    async def scenario():
+        controller = AdmissionController(max_in_flight=1, max_queue=2, queue_timeout=1.0, retry_after=7)
+        order = []
+
+        async def work(name, priority):
+            async with controller.admit(priority):
+                order.append(name)
+                await asyncio.sleep(0.01)
+
+        await controller.acquire(AdmissionController.QUERY)
+        upload = asyncio.create_task(work("upload", AdmissionController.UPLOAD))
+        query = asyncio.create_task(work("query", AdmissionController.QUERY))
+        await asyncio.sleep(0)
+
+        with pytest.raises(AdmissionRejected) as rejected:
+            await controller.acquire(AdmissionController.UPLOAD)
+        assert rejected.value.status_code == 503
+        assert rejected.value.headers["Retry-After"] == "7"
+        assert controller.metrics()["queue_depth"] == 2
+
+        controller.release()
+        await asyncio.gather(upload, query)
+        return order, controller.metrics()
+
+    order, metrics = asyncio.run(scenario())
+
+    assert order == ["query", "upload"]
+    assert metrics["shed_queue_full"] == 1
+    assert metrics["in_flight"] == 0
+    assert metrics["queue_depth"] == 0
+
+def test_queued_request_times_out():
+    """Test that a waiter gives up after the queue timeout and leaves the queue"""
+    async def scenario():
+        controller = AdmissionController(max_in_flight=1, max_queue=4, queue_timeout=0.01, retry_after=1)
+        await controller.acquire(AdmissionController.QUERY)
+        with pytest.raises(AdmissionRejected):
+            await controller.acquire(AdmissionController.QUERY)
+        return controller.metrics()
+
+    metrics = asyncio.run(scenario())
+
+    assert metrics["shed_timeout"] == 1
+    assert metrics["queue_depth"] == 0
+    assert metrics["in_flight"] == 1
+
+def test_slot_held_until_abandoned_worker_finishes():
+    """Test that a query timing out at its deadline keeps its slot until the worker thread returns"""
+    async def scenario():
+        controller = AdmissionController(max_in_flight=1, max_queue=2, queue_timeout=1.0, retry_after=1)
+        deadline = Deadline(50)
+
+        with pytest.raises(asyncio.TimeoutError):
+            async with controller.admit(AdmissionController.QUERY, deadline=deadline):
+                await run_within(deadline, time.sleep, 0.3)
+
+        held = controller.metrics()["in_flight"]
+        await asyncio.sleep(0.5)
+        return held, controller.metrics()["in_flight"]
+
+    held, released = asyncio.run(scenario())
+
+    assert held == 1
+    assert released == 0
+
+def test_cancelled_waiter_leaves_the_queue():
+    """Test that a cancelled waiter is dropped, so a later full queue displaces a live one with a 503"""
+    async def scenario():
+        controller = AdmissionController(max_in_flight=1, max_queue=1, queue_timeout=1.0, retry_after=1)
+        await controller.acquire(AdmissionController.QUERY)
+
+        abandoned = asyncio.create_task(controller.acquire(AdmissionController.BATCH))
+        await asyncio.sleep(0)
+        abandoned.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await abandoned
+        depth_after_cancel = controller.metrics()["queue_depth"]
+
+        batch = asyncio.create_task(controller.acquire(AdmissionController.BATCH))
+        await asyncio.sleep(0)
+        query = asyncio.create_task(controller.acquire(AdmissionController.QUERY))
+        await asyncio.sleep(0)
+
+        with pytest.raises(AdmissionRejected):
+            await batch
+        controller.release()
+        await query
+        return depth_after_cancel, controller.metrics()
+
+    depth_after_cancel, metrics = asyncio.run(scenario())
+
+    assert depth_after_cancel == 0
+    assert metrics["preempted"] == 1
+    assert metrics["in_flight"] == 1
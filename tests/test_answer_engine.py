@@ -0,0 +1,44 @@
+from app.services.answer_engine import ExtractiveAnswerEngine
+
+def test_answer_prefers_rare_matching_terms():
+    """Test that BM25 picks the sentence matching the distinctive question terms"""
+    engine = ExtractiveAnswerEngine()
+    contexts = [
+        "Python is a programming language. It is popular for data science.",
+        "Machine learning uses algorithms to learn patterns. Python libraries implement many of them.",
+    ]
+    engine.index_chunks(contexts)
+
+    answer, confidence = engine.answer("Which algorithms does machine learning use?", contexts)
+
+    assert answer == "Machine learning uses algorithms to learn patterns."
+    assert 0.0 < confidence <= 1.0
+
+def test_stemming_matches_inflections():
+    """Test that inflected forms of a question term still match"""
+    engine = ExtractiveAnswerEngine()
+    answer, _ = engine.answer("How are uploads indexed?", ["The service indexes each document at upload time."])
+
+    assert answer == "The service indexes each document at upload time."
+
+def test_no_answer_without_overlap():
+    """Test that unrelated context yields no answer"""
+    engine = ExtractiveAnswerEngine()
+    answer, confidence = engine.answer("What is the capital of France?", ["Python is a programming language."])
+
+    assert answer is None
+    assert confidence == 0.0
+
+def test_ingest_keeps_statistics_only_and_query_cache_is_bounded():
+    """Test that indexing retains no chunk text and the query-time cache stays under its byte cap"""
+    engine = ExtractiveAnswerEngine(cache_bytes=2000)
+    engine.index_chunks([f"Chunk {i} mentions alpha and beta." for i in range(100)])
+
+    assert engine.sentence_count == 100
+    assert engine.document_frequency["alpha"] == 100
+    assert not engine.chunks
+
+    for i in range(50):
+        engine.answer("Which chunk mentions alpha?", [f"Chunk {i} mentions alpha and beta."])
+    assert 0 < engine.cached_bytes <= 2000
+    assert engine.cached_bytes == sum(size for size, _ in engine.chunks.values())
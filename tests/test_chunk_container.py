@@ -0,0 +1,70 @@
+import pytest
+from app.services.aws_service import AWSService
+from app.services.chunk_container import ChunkContainer
+
+CONTENT = "First paragraph about AI.\n\nSecond paragraph about machine learning.\n\nThird one."
+CHUNKS = ["First paragraph about AI.", "about AI.\n\nSecond paragraph", "Second paragraph about machine learning.", "Third one."]
+
+def test_range_read_single_chunk():
+    """Test that a chunk can be decoded from only its byte range"""
+    blob = ChunkContainer.build(CHUNKS, {"original_filename": "notes.txt"}, content=CONTENT)
+
+    header_length = ChunkContainer.parse_prefix(blob[:ChunkContainer.PREFIX_SIZE])
+    header = ChunkContainer.parse_header(blob[ChunkContainer.PREFIX_SIZE:ChunkContainer.PREFIX_SIZE + header_length])
+    start, end = ChunkContainer.chunk_range(header, header_length, 2)
+
+    assert ChunkContainer.decode_chunk(blob[start:end + 1]) == CHUNKS[2]
+    assert header["metadata"] == {"original_filename": "notes.txt"}
+
+    with pytest.raises(IndexError):
+        ChunkContainer.chunk_range(header, header_length, len(CHUNKS))
+
+def test_reassemble_overlapping_chunks():
+    """Test that overlapping, whitespace-trimmed chunks reassemble into the original content"""
+    blob = ChunkContainer.build(CHUNKS, content=CONTENT)
+    chunks, header, trailer = ChunkContainer.read_all(blob)
+
+    assert chunks == CHUNKS
+    assert ChunkContainer.reassemble(chunks, trailer) == CONTENT
+
+def test_header_holds_only_offsets():
+    """Test that joins live in the trailer, outside the header a chunk read fetches"""
+    blob = ChunkContainer.build(CHUNKS, content=CONTENT)
+
+    header_length = ChunkContainer.parse_prefix(blob[:ChunkContainer.PREFIX_SIZE])
+    header = ChunkContainer.parse_header(blob[ChunkContainer.PREFIX_SIZE:ChunkContainer.PREFIX_SIZE + header_length])
+
+    assert set(header) == {"metadata", "chunks", "trailer"}
+    assert ChunkContainer.read_all(ChunkContainer.build(CHUNKS))[2] == {}
+
+def test_rejects_other_formats():
+    """Test that legacy JSON blobs are not mistaken for containers"""
+    with pytest.raises(ValueError):
+        ChunkContainer.parse_prefix(b'{"content": "x", "metadata": {}}')
+
+def test_write_streams_a_chunk_generator():
+    """Test that a container written from a one-shot generator matches the in-memory build"""
+    import io
+
+    out = io.BytesIO()
+    ChunkContainer.write((chunk for chunk in CHUNKS), out, {"tenant": "a"}, content=CONTENT)
+
+    assert out.getvalue() == ChunkContainer.build(CHUNKS, {"tenant": "a"}, content=CONTENT)
+    chunks, header, trailer = ChunkContainer.read_all(out.getvalue())
+    assert ChunkContainer.reassemble(chunks, trailer) == CONTENT
+
+def test_header_cache_is_bounded_by_bytes():
+    """Test that cached chunk headers are evicted once their estimated size passes the byte cap"""
+    blobs = {f"doc-{i}": ChunkContainer.build(CHUNKS, {"n": i}, content=CONTENT) for i in range(10)}
+    service = AWSService()
+    service._read_range = lambda key, start, end: next(
+        blob for document_id, blob in blobs.items() if document_id in key
+    )[start:end + 1]
+    service.header_cache_bytes = 2000
+
+    for document_id in blobs:
+        assert service._read_chunk(document_id, 2)["content"] == CHUNKS[2]
+
+    assert 0 < service.header_cache_used <= 2000
+    assert service.header_cache_used == sum(entry[0] for entry in service.header_cache.values())
+    assert list(service.header_cache)[-1] == "doc-9"
@@ -0,0 +1,71 @@
+import threading
+import numpy as np
+from app.services.compact_index import CompactVectorIndex
+
+def _vectors(count, dimension=8, seed=0):
+    return np.random.default_rng(seed).normal(size=(count, dimension)).astype(np.float32)
+
+def test_concurrent_adds_stay_aligned(tmp_path):
+    """Test that concurrent adds keep ids, codes and exact vectors row-aligned on disk and in memory"""
+    index = CompactVectorIndex(str(tmp_path))
+    vectors = _vectors(800)
+
+    def writer(offset):
+        for i in range(offset, 800, 4):
+            index.add([f"id-{i}"], vectors[i:i + 1])
+
+    threads = [threading.Thread(target=writer, args=(offset,)) for offset in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    reloaded = CompactVectorIndex(str(tmp_path))
+    assert len(index) == len(reloaded) == 800
+    assert len(reloaded.codes) == 800
+    for i in (0, 399, 799):
+        assert reloaded.search(vectors[i], k=1)[0][0] == f"id-{i}"
+
+def test_replayed_ids_are_skipped_and_torn_tail_dropped(tmp_path):
+    """Test that re-adding known ids is a no-op and a partially written batch is ignored on reload"""
+    index = CompactVectorIndex(str(tmp_path))
+    vectors = _vectors(10)
+    index.add([f"id-{i}" for i in range(10)], vectors)
+    index.add(["id-3", "id-3", "id-10"], np.concatenate([vectors[3:4], vectors[3:4], vectors[:1]]))
+    assert len(index) == 11
+
+    # An interrupted add: the vector landed but its id never did
+    with open(tmp_path / "vectors.f32", "ab") as f:
+        f.write(vectors[:1].tobytes())
+
+    reloaded = CompactVectorIndex(str(tmp_path))
+    assert reloaded.ids == index.ids
+    assert (tmp_path / "vectors.f32").stat().st_size == 11 * 8 * 4
+
+def test_pq_training_survives_reload(tmp_path):
+    """Test that a trained PQ index reloads its codebooks and keeps appending uint8 codes"""
+    vectors = _vectors(300, dimension=16)
+    index = CompactVectorIndex(str(tmp_path), mode="pq", pq_subvectors=4, pq_training_size=200)
+    index.add([f"id-{i}" for i in range(250)], vectors[:250])
+    index.wait_for_training()
+    assert index.codebooks is not None
+
+    reloaded = CompactVectorIndex(str(tmp_path), mode="pq", pq_subvectors=4, pq_training_size=200)
+    reloaded.add([f"id-{i}" for i in range(250, 300)], vectors[250:])
+
+    assert reloaded.codes.dtype == np.uint8 and reloaded.codes.shape == (300, 4)
+    assert not (tmp_path / "codes.f16").exists()
+    assert reloaded.search(vectors[280], k=1)[0][0] == "id-280"
+
+def test_search_keeps_running_while_pq_trains(tmp_path):
+    """Test that training runs off the add path and searches are answered from float16 codes meanwhile"""
+    vectors = _vectors(400, dimension=16)
+    index = CompactVectorIndex(str(tmp_path), mode="pq", pq_subvectors=4, pq_training_size=300)
+    index.add([f"id-{i}" for i in range(300)], vectors[:300])
+    index.add([f"id-{i}" for i in range(300, 400)], vectors[300:])
+
+    assert index.search(vectors[350], k=1)[0][0] == "id-350"
+    index.wait_for_training()
+
+    assert index.codes.dtype == np.uint8 and index.codes.shape == (400, 4)
+    assert index.search(vectors[350], k=1)[0][0] == "id-350"
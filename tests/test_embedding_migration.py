@@ -0,0 +1,88 @@
+import asyncio
+import chromadb
+from langchain.schema.embeddings import Embeddings
+from langchain.vectorstores import Chroma
+from app.services.embedding_migration import EmbeddingMigration
+from app.services.index_snapshot import WriteGate
+from app.services.rag_service import RAGService
+
+class CountingEmbeddings(Embeddings):
+    def __init__(self):
+        self.embedded = []
+
+    def embed_documents(self, texts):
+        self.embedded.extend(texts)
+        return [[float(len(text)), 1.0] for text in texts]
+
+    def embed_query(self, text):
+        return [float(len(text)), 1.0]
+
+def _source(tmp_path, count):
+    client = chromadb.PersistentClient(path=str(tmp_path / "chroma"))
+    source = client.get_or_create_collection("documents")
+    source.add(
+        ids=[f"chunk-{i}" for i in range(count)],
+        embeddings=[[float(i), 0.0] for i in range(count)],
+        documents=[f"text {i}" for i in range(count)],
+        metadatas=[{"chunk_id": i} for i in range(count)]
+    )
+    return client
+
+def _migration(client, tmp_path, embeddings, batch_size=2):
+    return EmbeddingMigration(
+        client, "documents", "documents-new", "new-model", embeddings,
+        str(tmp_path / "checkpoint.json"), rate_limit_per_second=0, batch_size=batch_size
+    )
+
+def test_resume_from_checkpoint(tmp_path):
+    """Test that a restarted migration re-embeds only the chunks after its checkpoint"""
+    client = _source(tmp_path, 10)
+    first = CountingEmbeddings()
+    migration = _migration(client, tmp_path, first)
+    migration.offset, migration.migrated = 6, 6
+    migration._save_checkpoint()
+
+    resumed = _migration(client, tmp_path, first)
+    completed = []
+
+    async def on_complete(finished):
+        completed.append(finished.migrated)
+
+    asyncio.run(resumed._run(on_complete))
+
+    assert resumed.status == "completed"
+    assert completed == [10]
+    assert len(first.embedded) == 4
+    assert client.get_collection("documents-new").count() == 4
+
+def test_switch_waits_for_inflight_writes(tmp_path):
+    """Test that the final switch only happens once in-flight uploads have drained"""
+    client = _source(tmp_path, 4)
+    migration = _migration(client, tmp_path, CountingEmbeddings())
+    gate = WriteGate()
+
+    async def scenario():
+        async with gate.writing():
+            migration.start(lambda finished: asyncio.sleep(0), gate)
+            await asyncio.sleep(0.5)
+            assert migration.running
+        await migration._task
+        assert migration.status == "completed"
+
+    asyncio.run(scenario())
+
+def test_writes_during_migration_are_dual_written(tmp_path):
+    """Test that chunks uploaded while a migration runs land in both collections"""
+    client = _source(tmp_path, 2)
+    embeddings = CountingEmbeddings()
+    service = RAGService.__new__(RAGService)
+    service.compact_index = None
+    service.embedding_migration = _migration(client, tmp_path, embeddings)
+    service.embedding_migration.status = "running"
+    service.embedding_migration_store = Chroma(client=client, collection_name="documents-new", embedding_function=embeddings)
+    store = Chroma(client=client, collection_name="documents", embedding_function=embeddings)
+
+    service._write_chunks(store, ["late chunk"], [{"chunk_id": 0}], ["late"])
+
+    assert client.get_collection("documents").get(ids=["late"])["ids"] == ["late"]
+    assert client.get_collection("documents-new").get(ids=["late"])["ids"] == ["late"]
@@ -0,0 +1,35 @@
+import time
+import asyncio
+from app.services.health_prober import HealthProber
+
+def failing_probe():
+    raise ConnectionError("bucket unreachable")
+
+def slow_probe():
+    time.sleep(0.2)
+
+def test_snapshot_reports_failures_timeouts_and_latency():
+    """Test that one probe pass records health, errors and microsecond latency per probe"""
+    prober = HealthProber(
+        {"ok": lambda: {"chunks": 3}, "s3": failing_probe, "slow": slow_probe},
+        timeout_seconds=0.05
+    )
+    assert prober.get_snapshot()["status"] == "starting"
+
+    async def scenario():
+        await prober.probe_all()
+        first = prober.get_snapshot()
+        # The slow probe's thread is still running, so the next pass must not start another
+        await prober.probe_all()
+        return first, prober.get_snapshot()
+
+    first, second = asyncio.run(scenario())
+    probes = first["probes"]
+
+    assert first["status"] == "degraded"
+    assert probes["ok"]["healthy"] and probes["ok"]["detail"] == {"chunks": 3}
+    assert isinstance(probes["ok"]["latency_us"], int)
+    assert probes["s3"]["error"] == "bucket unreachable"
+    assert probes["slow"]["error"] == "timed out"
+    assert second["probes"]["slow"]["error"] == "previous probe still running"
+    assert second["staleness_us"] >= 0
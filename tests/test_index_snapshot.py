@@ -0,0 +1,76 @@
+import os
+import asyncio
+import pytest
+from app.core.config import settings
+from app.services.index_snapshot import IndexSnapshots, WriteGate
+
+@pytest.fixture
+def index_dirs(tmp_path, monkeypatch):
+    chroma_dir = tmp_path / "chroma"
+    (chroma_dir / "segment").mkdir(parents=True)
+    (chroma_dir / "chroma.sqlite3").write_bytes(b"sqlite pages")
+    (chroma_dir / "segment" / "data_level0.bin").write_bytes(b"\x00\x01" * 100)
+    monkeypatch.setattr(settings, "chroma_persist_direcotry", str(chroma_dir))
+    monkeypatch.setattr(settings, "vector_backend", "chroma")
+    monkeypatch.setattr(settings, "compact_index_enabled", False)
+    monkeypatch.setattr(settings, "near_duplicate_detection", False)
+    monkeypatch.setattr(settings, "vector_shard_hosts", "")
+    return chroma_dir
+
+def test_snapshot_round_trip(tmp_path, index_dirs):
+    """Test that a snapshot restores byte-identical index files on an empty node"""
+    snapshots = IndexSnapshots(str(tmp_path / "snapshots"))
+    pointer = asyncio.run(snapshots.create(WriteGate()))
+
+    assert pointer["files"] == 2
+    assert snapshots.latest()["sha256"] == pointer["sha256"]
+    assert snapshots.restore_latest() is None # Local index still present
+
+    for root, _, files in os.walk(index_dirs, topdown=False):
+        for name in files:
+            os.remove(os.path.join(root, name))
+        os.rmdir(root)
+
+    manifest = snapshots.restore_latest()
+    assert manifest["created_at"] == pointer["created_at"]
+    assert (index_dirs / "segment" / "data_level0.bin").read_bytes() == b"\x00\x01" * 100
+
+def test_corrupt_snapshot_is_rejected(tmp_path, index_dirs):
+    """Test that an archive whose checksum does not match is never extracted"""
+    snapshots = IndexSnapshots(str(tmp_path / "snapshots"))
+    pointer = asyncio.run(snapshots.create(WriteGate()))
+    with open(tmp_path / "snapshots" / pointer["name"], "ab") as f:
+        f.write(b"garbage")
+
+    (index_dirs / "chroma.sqlite3").unlink()
+    (index_dirs / "segment" / "data_level0.bin").unlink()
+
+    with pytest.raises(ValueError):
+        snapshots.restore_latest()
+
+def test_freeze_waits_for_writers_and_blocks_new_ones():
+    """Test that a freeze starts only after in-flight writes finish and holds back later ones"""
+    async def scenario():
+        gate, events = WriteGate(), []
+
+        async def write(name, delay):
+            async with gate.writing():
+                events.append(f"{name} start")
+                await asyncio.sleep(delay)
+                events.append(f"{name} end")
+
+        async def freeze():
+            async with gate.frozen():
+                events.append("frozen")
+                await asyncio.sleep(0.02)
+                events.append("thawed")
+
+        first = asyncio.create_task(write("first", 0.02))
+        await asyncio.sleep(0)
+        snapshot = asyncio.create_task(freeze())
+        await asyncio.sleep(0)
+        second = asyncio.create_task(write("second", 0))
+        await asyncio.gather(first, snapshot, second)
+        return events
+
+    assert asyncio.run(scenario()) == ["first start", "first end", "frozen", "thawed", "second start", "second end"]
@@ -0,0 +1,31 @@
+from app.services.ingestion import MemoryGovernor, iter_windows
+
+def test_windows_cover_text_and_cut_at_separators():
+    """Test that windows reassemble to the input and end on paragraph breaks when possible"""
+    text = "\n\n".join(f"paragraph {i} " + "word " * 20 for i in range(50))
+    windows = list(iter_windows(text, 300))
+
+    assert "".join(windows) == text
+    assert all(len(window) <= 300 for window in windows)
+    assert all(window.endswith("\n\n") for window in windows[:-1])
+
+def test_governor_shrinks_and_recovers_batch_size(monkeypatch):
+    """Test that the batch size halves above the ceiling and grows back below it"""
+    governor = MemoryGovernor(ceiling_mb=100, max_batch_size=64)
+
+    monkeypatch.setattr(MemoryGovernor, "current_rss", staticmethod(lambda: 150 * 1024 * 1024))
+    assert governor.after_batch() == 32
+    assert governor.after_batch() == 16
+
+    monkeypatch.setattr(MemoryGovernor, "current_rss", staticmethod(lambda: 10 * 1024 * 1024))
+    assert governor.after_batch() == 32
+    assert governor.after_batch() == 64
+    assert governor.after_batch() == 64
+
+def test_governor_never_drops_below_floor(monkeypatch):
+    """Test that a ceiling below baseline RSS does not shrink batches to single chunks"""
+    governor = MemoryGovernor(ceiling_mb=1, max_batch_size=64)
+    monkeypatch.setattr(MemoryGovernor, "current_rss", staticmethod(lambda: 500 * 1024 * 1024))
+    for _ in range(10):
+        governor.after_batch()
+    assert governor.batch_size == 8
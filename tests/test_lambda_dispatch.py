@@ -0,0 +1,72 @@
+import io
+import json
+import asyncio
+import zipfile
+from app.lambdas import document_processor
+from app.services.aws_service import AWSService
+
+class FakeS3:
+    def __init__(self):
+        self.objects = {}
+
+    def put_object(self, Bucket, Key, Body, **kwargs):
+        self.objects[(Bucket, Key)] = Body
+
+    def get_object(self, Bucket, Key, **kwargs):
+        return {"Body": io.BytesIO(self.objects[(Bucket, Key)])}
+
+    def list_objects_v2(self, Bucket, Prefix):
+        keys = [key for bucket, key in self.objects if bucket == Bucket and key.startswith(Prefix)]
+        return {"Contents": [{"Key": key} for key in keys]} if keys else {}
+
+class FakeLambda:
+    """Runs document-processor in-process, as LocalStack would for an 'Event' invoke"""
+
+    def __init__(self, s3):
+        self.s3 = s3
+        self.invocations = []
+
+    def invoke(self, FunctionName, InvocationType, Payload):
+        event = json.loads(Payload)
+        self.invocations.append((FunctionName, InvocationType, len(event["chunks"])))
+        document_processor.process_batch(event, self.s3)
+        return {"StatusCode": 202}
+
+def test_fan_out_batches_and_collects_results():
+    """Test that chunks are dispatched in batches as Event invokes and collected from S3"""
+    service = AWSService()
+    service.s3_client = FakeS3()
+    service.lambda_client = FakeLambda(service.s3_client)
+    chunks = [f"chunk   number {i}\n" for i in range(70)]
+
+    async def scenario():
+        job = await service.process_document_async("doc-1", "".join(chunks), chunks=chunks)
+        return job, await service.collect_processing_results(job["job_id"], job["batches"], timeout=1.0)
+
+    job, results = asyncio.run(scenario())
+
+    assert job["batches"] == 3
+    assert {invocation[1] for invocation in service.lambda_client.invocations} == {"Event"}
+    assert results["complete"]
+    processed = [chunk for batch in results["batches"] for chunk in batch["chunks"]]
+    assert [chunk["chunk_id"] for chunk in processed] == list(range(70))
+    assert processed[5]["content"] == "chunk number 5"
+
+def test_batches_respect_payload_size():
+    """Test that a batch is closed before it would exceed the byte cap"""
+    batches = AWSService._batch_chunks(["a" * 60, "b" * 60, "c" * 60], max_chunks=10, max_bytes=100)
+    assert [start for start, _ in batches] == [0, 1, 2]
+
+def test_lambda_package_contains_handler():
+    """Test that the deployment zip holds the handler module"""
+    package = zipfile.ZipFile(io.BytesIO(AWSService._build_lambda_package()))
+    assert "def lambda_handler" in package.read("document_processor.py").decode()
+
+def test_batches_measure_the_escaped_payload():
+    """Test that non-ASCII chunks are sized as JSON-escaped text so every Event payload stays under the cap"""
+    chunks = ["数据" * 1000 for _ in range(32)]
+    batches = AWSService._batch_chunks(chunks, max_chunks=32, max_bytes=200000)
+
+    assert sum(len(batch) for _, batch in batches) == 32
+    for _, batch in batches:
+        assert len(json.dumps({"chunks": batch})) <= 200000
@@ -0,0 +1,50 @@
+from app.services.near_duplicate import NearDuplicateIndex
+
+CONTRACT = (
+    "This agreement is entered into by the parties named below and governs the supply of services, "
+    "payment terms, confidentiality obligations and termination rights for the duration of the contract."
+)
+
+def test_near_duplicates_link_to_first_copy(tmp_path):
+    """Test that a lightly edited copy links to the stored chunk while unrelated text is kept"""
+    path = str(tmp_path / "near_duplicates.jsonl")
+    index = NearDuplicateIndex(path)
+
+    keep, links, signatures = index.plan("", [CONTRACT], ["original"])
+    assert keep == [0] and not links
+    index.commit("", signatures, [])
+
+    edited = CONTRACT.replace("the contract.", "the contract term.")
+    unrelated = "Machine learning models learn patterns from training data to make predictions."
+    keep, links, signatures = index.plan("", [edited, unrelated, unrelated], ["edited", "unrelated", "copy"])
+
+    assert keep == [1]
+    assert links == {0: "original", 2: "unrelated"}
+    index.commit("", signatures, [("original", {"document_id": "v2", "chunk_id": 0})])
+
+    reloaded = NearDuplicateIndex(path)
+    assert reloaded.references_for("original") == [{"document_id": "v2", "chunk_id": 0}]
+    assert reloaded.report()["vectors_saved"] == 1
+    assert reloaded.report()["chunks_indexed"] == 2
+
+def test_namespaces_are_isolated():
+    """Test that identical chunks from different tenants are both kept"""
+    index = NearDuplicateIndex()
+    _, _, signatures = index.plan("tenant-a", [CONTRACT], ["a"])
+    index.commit("tenant-a", signatures, [])
+
+    keep, links, _ = index.plan("tenant-b", [CONTRACT], ["b"])
+    assert keep == [0] and not links
+
+def test_reindexing_a_document_adds_no_references():
+    """Test that committing the same duplicate chunk of a document twice records one reference"""
+    index = NearDuplicateIndex()
+    keep, _, signatures = index.plan("", [CONTRACT], ["original"])
+    index.commit("", signatures, [])
+
+    for _ in range(2):
+        _, links, signatures = index.plan("", [CONTRACT], ["copy"])
+        index.commit("", signatures, [(links[0], {"document_id": "v2", "chunk_id": 3})])
+
+    assert index.references_for("original") == [{"document_id": "v2", "chunk_id": 3}]
+    assert index.report()["duplicates_linked"] == 1
@@ -0,0 +1,84 @@
+import pytest
+import numpy as np
+from app.services.numpy_vector_store import NumpyVectorStore
+
+@pytest.fixture
+def store(tmp_path):
+    store = NumpyVectorStore(str(tmp_path))
+    vectors = np.eye(4, dtype=np.float32)
+    store.add_embeddings(
+        ["alpha", "beta", "gamma", "delta"],
+        vectors,
+        metadatas=[{"type": ".txt"}, {"type": ".pdf"}, {"type": ".txt"}, {"type": ".pdf"}],
+        ids=["a", "b", "c", "d"]
+    )
+    yield store
+
+def test_exact_search(store):
+    """Test that the closest vector comes back first with a zero distance"""
+    hits = store.similarity_search_by_vector_with_relevance_scores([0.0, 1.0, 0.1, 0.0], k=2)
+
+    assert [doc.page_content for doc, _ in hits] == ["beta", "gamma"]
+    assert hits[0][1] < hits[1][1]
+
+def test_where_filter_and_tombstones(store):
+    """Test metadata filtering and tombstone deletes"""
+    hits = store.similarity_search_by_vector_with_relevance_scores([0.0, 1.0, 0.0, 0.0], k=4, filter={"type": {"$eq": ".txt"}})
+    assert {doc.page_content for doc, _ in hits} == {"alpha", "gamma"}
+
+    store.delete(["c"])
+    hits = store.similarity_search_by_vector_with_relevance_scores([0.0, 0.0, 1.0, 0.0], k=4)
+    assert "gamma" not in [doc.page_content for doc, _ in hits]
+    assert len(store) == 3
+
+def test_batch_search_and_reload(store, tmp_path):
+    """Test batch queries and that appends and deletes survive a reload"""
+    store.delete(["a"])
+    store.add_embeddings(["epsilon"], [[1.0, 1.0, 0.0, 0.0]], ids=["e"])
+
+    reloaded = NumpyVectorStore(str(tmp_path))
+    results = reloaded.similarity_search_batch_by_vector(np.eye(4)[:2], k=1)
+
+    assert len(reloaded) == 4
+    assert results[0][0][0].page_content == "epsilon"
+    assert results[1][0][0].page_content == "beta"
+
+def test_search_during_growth(tmp_path):
+    """Test that searches running while appends grow the matrix never fail or see partial rows"""
+    import threading
+
+    store = NumpyVectorStore(str(tmp_path))
+    store.INITIAL_CAPACITY = 8
+    errors = []
+    done = threading.Event()
+
+    def search():
+        while not done.is_set():
+            try:
+                for doc, _ in store.similarity_search_by_vector_with_relevance_scores([1.0, 0.0, 0.0, 0.0], k=3):
+                    assert doc.page_content.startswith("chunk")
+            except Exception as e:
+                errors.append(e)
+
+    readers = [threading.Thread(target=search) for _ in range(3)]
+    for reader in readers:
+        reader.start()
+    for i in range(200):
+        store.add_embeddings([f"chunk {i}"], [[1.0, float(i), 0.0, 0.0]], ids=[str(i)])
+    done.set()
+    for reader in readers:
+        reader.join()
+
+    assert errors == []
+    assert len(store) == 200
+
+def test_uncommitted_records_are_dropped_on_reload(store, tmp_path):
+    """Test that metadata lines written after the last committed state don't shift later rows"""
+    with open(tmp_path / "metadata.jsonl", "a") as f:
+        f.write('{"id": "torn", "text": "torn", "metadata": {}}\n{"id": "half')
+
+    reopened = NumpyVectorStore(str(tmp_path))
+    reopened.add_embeddings(["epsilon"], [[1.0, 1.0, 1.0, 0.0]], ids=["e"])
+
+    hits = NumpyVectorStore(str(tmp_path)).similarity_search_by_vector_with_relevance_scores([1.0, 1.0, 1.0, 0.0], k=1)
+    assert hits[0][0].page_content == "epsilon"
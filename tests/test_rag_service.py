@@ -1,7 +1,50 @@
+import io
+import re
+import time
 import pytest
 import asyncio
+from datetime import datetime
+from langchain.schema.embeddings import Embeddings
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from app.core.deadline import Deadline
+from app.services.answer_engine import ExtractiveAnswerEngine
+from app.services.chunk_container import ChunkContainer, ChunkContainerWriter
+from app.services.numpy_vector_store import NumpyVectorStore
 from app.services.rag_service import RAGService
 
+class WordEmbeddings(Embeddings):
+    """One dimension per vocabulary word, so overlapping words mean nearby vectors"""
+
+    VOCABULARY = ["python", "language", "rust", "memory", "safe", "guido", "created", "who", "what", "weather"]
+
+    def _embed(self, text):
+        words = text.lower().replace("?", "").replace(".", "").split()
+        return [float(words.count(word)) + 0.01 for word in self.VOCABULARY]
+
+    def embed_documents(self, texts):
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+def bare_service(tmp_path, llm=None) -> RAGService:
+    """A RAGService over a local numpy store, without loading any models"""
+    service = RAGService.__new__(RAGService)
+    service.embeddings = WordEmbeddings()
+    service.vector_store = NumpyVectorStore(str(tmp_path / "store"), embedding_function=service.embeddings)
+    service.tenant_vector_stores = {}
+    service.compact_index = None
+    service.embedding_migration = None
+    service.near_duplicates = None
+    service.answer_engine = ExtractiveAnswerEngine()
+    service.llm = llm
+    service.vector_store.add_texts(
+        ["Python is a language. Guido created Python.", "Rust is a memory safe language."],
+        metadatas=[{"type": ".txt", "document_id": "python"}, {"type": ".pdf", "document_id": "rust"}],
+        ids=["python-0", "rust-0"]
+    )
+    return service
+
 @pytest.fixture
 async def rag_service():
     
@@ -36,4 +79,135 @@ async def test_query_documents(rag_service):
 async def test_get_document_stats(rag_service):
     """Test getting document statistics"""
     stats = await rag_service.get_document_stats()
-    assert "total_documents" in stats
\ No newline at end of file
+    assert "total_documents" in stats
+
+def test_where_filter_combines_conditions_with_and():
+    """Test that several filters become one $and clause, with upload dates as timestamp ranges"""
+    after, before = datetime(2024, 1, 1), datetime(2024, 6, 30)
+
+    where = RAGService._build_where_filter({
+        "document_type": ".pdf",
+        "uploaded_by": "alice",
+        "uploaded_after": after,
+        "uploaded_before": before,
+        "document_id": None
+    })
+
+    assert where == {"$and": [
+        {"type": {"$eq": ".pdf"}},
+        {"uploaded_by": {"$eq": "alice"}},
+        {"uploaded_at": {"$gte": after.timestamp()}},
+        {"uploaded_at": {"$lte": before.timestamp()}}
+    ]}
+    assert RAGService._build_where_filter({"document_id": "report"}) == {"document_id": {"$eq": "report"}}
+    assert RAGService._build_where_filter({"document_id": None}) is None
+    assert RAGService._build_where_filter(None) is None
+
+def test_tenant_collection_names_are_stable_and_valid(tmp_path):
+    """Test that each tenant maps to its own Chroma-safe collection and no tenant to the default one"""
+    service = bare_service(tmp_path)
+    service.default_collection_name = "documents"
+
+    first = service._collection_name("alice@example.com")
+
+    assert service._collection_name(None) == "documents"
+    assert first == service._collection_name("alice@example.com")
+    assert first != service._collection_name("bob@example.com")
+    assert re.fullmatch(r"documents-[0-9a-f]{16}", first)
+
+def test_slow_qa_model_degrades_at_deadline(tmp_path):
+    """Test that a QA model running past the deadline yields the extractive answer, flagged degraded"""
+    def slow_llm(question, context):
+        time.sleep(1.5)
+        return {"answer": "too late", "score": 0.9}
+
+    service = bare_service(tmp_path, llm=slow_llm)
+
+    async def scenario():
+        started = time.monotonic()
+        result = await service.query_documents("Who created Python?", k=1, deadline=Deadline(600))
+        return result, time.monotonic() - started
+
+    result, elapsed = asyncio.run(scenario())
+
+    assert elapsed < 1.2
+    assert result["degraded"] is True
+    assert result["answer"] == "Guido created Python."
+    assert result["sources"][0]["metadata"]["document_id"] == "python"
+
+def test_degraded_query_skips_the_qa_model(tmp_path):
+    """Test that a query marked degraded under overload never calls the QA model"""
+    def failing_llm(question, context):
+        raise AssertionError("QA model called while degraded")
+
+    service = bare_service(tmp_path, llm=failing_llm)
+    result = asyncio.run(service.query_documents("Who created Python?", k=1, degraded=True))
+
+    assert result["degraded"] is True
+    assert result["answer"] == "Guido created Python."
+
+def test_add_documents_hands_each_chunk_to_the_container(tmp_path):
+    """Test that the chunks indexed for a document are the ones its container stores, split once"""
+    service = bare_service(tmp_path)
+    service.text_splitter = RecursiveCharacterTextSplitter(chunk_size=60, chunk_overlap=15)
+    document = "Python is a language. Guido created Python.\n\nRust is a memory safe language. " * 5
+
+    with ChunkContainerWriter(content=document.strip()) as container:
+        added = asyncio.run(service.add_documents(
+            [document], [{"document_id": "mixed"}], on_chunk=lambda _, chunk: container.add(chunk)
+        ))
+        out = io.BytesIO()
+        container.finish(out)
+
+    chunks, _, trailer = ChunkContainer.read_all(out.getvalue())
+    assert added is True
+    assert chunks == list(service.iter_document_chunks(document))
+    assert ChunkContainer.reassemble(chunks, trailer) == document.strip()
+    assert len(service.vector_store.records) == 2 + len(chunks)
+
+def _collect(service, queries):
+    async def scenario():
+        return [result async for result in service.query_batch(queries)]
+    return asyncio.run(scenario())
+
+def test_query_batch_groups_by_filter_and_skips_qa_for_off_topic(tmp_path):
+    """Test one store call per distinct filter, and that questions past the cutoff never reach the QA model"""
+    qa_batches = []
+
+    def batched_llm(inputs, batch_size):
+        qa_batches.append([item["question"] for item in inputs])
+        return [{"answer": "stub", "score": 0.9} for _ in inputs]
+
+    service = bare_service(tmp_path, llm=batched_llm)
+    searches = []
+    search_batch = service._search_batch
+    service._search_batch = lambda embeddings, k, where, tenant: searches.append(where) or search_batch(embeddings, k, where, tenant)
+
+    results = _collect(service, [
+        {"question": "Who created Python?"},
+        {"question": "What is Rust?", "filters": {"document_type": ".pdf"}},
+        {"question": "weather"},
+        {"question": "What is memory safe?", "filters": {"document_type": ".pdf"}},
+    ])
+    by_index = {result["index"]: result for result in results}
+
+    assert sorted(searches, key=str) == [None, {"type": {"$eq": ".pdf"}}]
+    assert by_index[2]["answer"] == "No relevant documents found."
+    assert qa_batches == [["Who created Python?", "What is Rust?", "What is memory safe?"]]
+    assert by_index[3]["sources"][0]["metadata"]["document_id"] == "rust"
+
+def test_query_batch_puts_an_index_on_every_line(tmp_path):
+    """Test that every streamed result, including failures, carries the index of its question"""
+    service = bare_service(tmp_path)
+    queries = [{"question": "Who created Python?"}, {"question": "weather"}, {"question": "What is Rust?"}]
+
+    results = _collect(service, queries)
+    assert sorted(result["index"] for result in results) == [0, 1, 2]
+
+    def broken_search(*args):
+        raise RuntimeError("store unavailable")
+
+    service._search_batch = broken_search
+    results = _collect(service, queries)
+    assert sorted(result["index"] for result in results) == [0, 1, 2]
+    assert all("error" in result for result in results)
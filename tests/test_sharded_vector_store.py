@@ -0,0 +1,64 @@
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from langchain.schema.embeddings import Embeddings
+from app.services.numpy_vector_store import NumpyVectorStore
+from app.services.sharded_vector_store import ShardedVectorStore
+
+class AxisEmbeddings(Embeddings):
+    """Text "i" embeds to a unit vector at angle i degrees, so nearby numbers are nearby vectors"""
+
+    def _embed(self, text):
+        angle = np.radians(float(text))
+        return [float(np.cos(angle)), float(np.sin(angle))]
+
+    def embed_documents(self, texts):
+        return [self._embed(text) for text in texts]
+
+    def embed_query(self, text):
+        return self._embed(text)
+
+def _sharded(tmp_path, count=3, executor=None):
+    embeddings = AxisEmbeddings()
+    shards = [NumpyVectorStore(str(tmp_path / f"shard-{i}"), embedding_function=embeddings) for i in range(count)]
+    return ShardedVectorStore(shards, embeddings, executor=executor)
+
+def test_chunks_of_a_document_share_a_shard(tmp_path):
+    """Test that chunks are placed by document_id, stably, and spread across shards"""
+    store = _sharded(tmp_path)
+    documents = [f"doc-{i}" for i in range(12)]
+    store.add_texts(
+        [str(i) for i in range(24)],
+        metadatas=[{"document_id": documents[i % 12]} for i in range(24)],
+        ids=[f"chunk-{i}" for i in range(24)]
+    )
+
+    for shard_index, shard in enumerate(store.shards):
+        for record in shard.records[:shard.count]:
+            assert ShardedVectorStore.shard_for(record["metadata"]["document_id"], 3) == shard_index
+    assert len({ShardedVectorStore.shard_for(document, 3) for document in documents}) == 3
+    assert len(store) == 24
+
+def test_top_k_is_merged_across_shards(tmp_path):
+    """Test that the global top k is the k closest hits from all shards, closest first"""
+    store = _sharded(tmp_path)
+    store.add_texts(
+        [str(i) for i in range(0, 90, 5)],
+        metadatas=[{"document_id": f"doc-{i}"} for i in range(0, 90, 5)]
+    )
+
+    hits = store.similarity_search_with_score("41", k=4)
+    batch = store.similarity_search_batch_by_vector([AxisEmbeddings().embed_query("41")], k=4)[0]
+
+    assert [doc.page_content for doc, _ in hits] == ["40", "45", "35", "50"]
+    assert [doc.page_content for doc, _ in batch] == ["40", "45", "35", "50"]
+    assert [score for _, score in hits] == sorted(score for _, score in hits)
+
+def test_stores_share_one_executor(tmp_path):
+    """Test that per-tenant stores given one executor search through it without pools of their own"""
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        stores = [_sharded(tmp_path / f"tenant-{t}", executor=executor) for t in range(4)]
+        for t, store in enumerate(stores):
+            store.add_texts([str(t * 10 + i) for i in range(5)], metadatas=[{"document_id": f"doc-{i}"} for i in range(5)])
+
+        assert all(store.executor is executor for store in stores)
+        assert [store.similarity_search("21", k=1)[0].page_content for store in stores] == ["4", "14", "21", "30"]